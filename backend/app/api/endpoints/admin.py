@@ -3,6 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
 from sqlalchemy.orm import Session
 
 from app.db.database import get_db
+from app.core.cache import invalidate_cache, invalidate_redis_cache
 from app.services.data_sync_service import data_sync_service
 from app.services.fpl_api_service import fpl_api
 from app.db.models import Player, Team, Fixture
@@ -124,9 +125,10 @@ async def get_system_info():
 @router.post("/clear-cache")
 async def clear_cache():
     """
-    Clear application cache (placeholder for Redis implementation)
+    Clear application cache
     """
-    # This would clear Redis cache in a full implementation
+    invalidate_cache()
+    await invalidate_redis_cache()
     return {
         "message": "Cache cleared successfully",
         "timestamp": "now"
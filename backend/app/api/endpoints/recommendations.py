@@ -1,5 +1,7 @@
+import json
 from typing import List, Optional, Dict, Any
 from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
@@ -36,6 +38,7 @@ async def get_squad_recommendation(
     formation: str = Query("3-5-2", description="Preferred formation"),
     gameweeks: int = Query(3, description="Number of gameweeks to optimize for"),
     user_preferences: Optional[Dict[str, Any]] = Body(None),
+    no_cache: bool = Query(False, description="Bypass cached AI responses"),
     db: Session = Depends(get_db)
 ):
     """Get AI-powered squad recommendations using advanced analytics"""
@@ -45,12 +48,41 @@ async def get_squad_recommendation(
             budget=budget,
             formation=formation,
             gameweeks=gameweeks,
-            user_preferences=user_preferences
+            user_preferences=user_preferences,
+            no_cache=no_cache
         )
         return recommendation
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/squad/stream")
+async def stream_squad_recommendation(
+    budget: float = Query(100.0, description="Available budget in millions"),
+    formation: str = Query("3-5-2", description="Preferred formation"),
+    gameweeks: int = Query(3, description="Number of gameweeks to optimize for"),
+    user_preferences: Optional[Dict[str, Any]] = Body(None),
+    no_cache: bool = Query(False, description="Bypass cached AI responses"),
+    db: Session = Depends(get_db)
+):
+    """Stream AI squad recommendations as server-sent events
+
+    Emits `token` events with LLM output as it is generated, followed by a single
+    `result` event carrying the same payload as POST /squad.
+    """
+    ai_service = AIService(db=db)
+
+    async def events():
+        async for event, data in ai_service.stream_squad_recommendation(
+            budget=budget,
+            formation=formation,
+            gameweeks=gameweeks,
+            user_preferences=user_preferences,
+            no_cache=no_cache
+        ):
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
 @router.post("/transfers", response_model=List[TransferRecommendation])
 async def get_transfer_recommendations(
     current_squad: List[int],
@@ -141,6 +173,30 @@ async def natural_language_query(
         print(f"❌ AI Query Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/query/stream")
+async def stream_natural_language_query(
+    request: AIQueryRequest,
+    db: Session = Depends(get_db)
+):
+    """Stream the answer to a natural language query as server-sent events
+
+    Emits `token` events with LLM output as it is generated, followed by a single
+    `result` event carrying the parsed answer.
+    """
+    if not request.query or not request.query.strip():
+        raise HTTPException(status_code=422, detail="Query cannot be empty")
+
+    ai_service = AIService(db=db)
+
+    async def events():
+        async for event, data in ai_service.stream_player_query(
+            query=request.query.strip(),
+            context=request.context
+        ):
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
 # Additional AI-powered endpoints
 @router.post("/ai-transfers")
 async def get_ai_transfer_recommendations(
@@ -0,0 +1,300 @@
+"""
+Caching helpers for Fantasy XI Wizard: in-process caches plus an optional
+Redis layer shared between worker processes
+"""
+
+import asyncio
+import dataclasses
+import functools
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+# Optional Redis client, shares cached data across worker processes
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import RedisError
+    REDIS_AVAILABLE = True
+    _REDIS_ERRORS: Tuple[type, ...] = (RedisError, OSError)
+except ImportError:
+    REDIS_AVAILABLE = False
+    _REDIS_ERRORS = (OSError,)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Cache key -> (expiry timestamp, value)
+_cache: Dict[Any, Tuple[float, Any]] = {}
+_locks: Dict[Any, asyncio.Lock] = {}
+
+# Bumped on every invalidation so derived caches can tell their inputs changed
+_data_version = 0
+
+
+def async_ttl_cache(ttl_seconds: float = 300):
+    """Cache the result of an async method for ``ttl_seconds``.
+
+    The cache is process-wide and keyed on the method and its arguments (not the
+    instance), so services created per request share results. Concurrent misses
+    wait on a single in-flight call. Empty results are not cached, so a failed
+    fetch is retried on the next call.
+
+    ``wrapper.refresh(self, ...)`` recomputes the value and swaps it in, so a
+    background task can keep an entry warm while readers keep the old value.
+    """
+    def decorator(func):
+        name = func.__qualname__
+        # Refresh through any cache layer below this one rather than reading from it
+        compute = getattr(func, "refresh", func)
+
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())))
+
+            entry = _cache.get(key)
+            if entry and entry[0] > time.monotonic():
+                return entry[1]
+
+            lock = _locks.setdefault(key, asyncio.Lock())
+            async with lock:
+                # Another caller may have filled the cache while we waited
+                entry = _cache.get(key)
+                if entry and entry[0] > time.monotonic():
+                    return entry[1]
+
+                value = await func(self, *args, **kwargs)
+                if value:
+                    _cache[key] = (time.monotonic() + ttl_seconds, value)
+                return value
+
+        async def refresh(self, *args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())))
+            value = await compute(self, *args, **kwargs)
+            if value:
+                _cache[key] = (time.monotonic() + ttl_seconds, value)
+            return value
+
+        wrapper.refresh = refresh
+        return wrapper
+
+    return decorator
+
+
+def invalidate_cache(name: Optional[str] = None) -> None:
+    """Drop cached results for methods whose qualified name ends with ``name`` (all if None)"""
+    global _data_version
+    _data_version += 1
+    if name is None:
+        _cache.clear()
+        return
+    for key in [key for key in _cache if key[0].endswith(name)]:
+        del _cache[key]
+
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used key"""
+
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+
+    def get(self, key: Any) -> Optional[Any]:
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Any, value: Any) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+def data_version() -> int:
+    """Counter identifying the current generation of cached source data"""
+    return _data_version
+
+
+class SemanticCache:
+    """Nearest-neighbour cache over embedding vectors
+
+    Entries are stored as rows of a normalized matrix, so a lookup is one
+    matrix-vector product. A hit needs cosine similarity of at least
+    ``threshold``, an unexpired entry and a matching data version.
+    """
+
+    def __init__(self, threshold: float = 0.93, ttl_seconds: float = 900, max_entries: int = 256):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: List[Tuple[float, int, Any]] = []  # (expiry, data version, value)
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, embedding: Sequence[float], accept=None) -> Optional[Any]:
+        """Return the most similar live value, optionally filtered by ``accept(value)``"""
+        if not self._entries:
+            return None
+
+        similarities = self._vectors @ self._normalize(embedding)
+        now = time.monotonic()
+        version = data_version()
+        for index in np.argsort(-similarities):
+            if similarities[index] < self.threshold:
+                break
+            expiry, entry_version, value = self._entries[index]
+            if expiry > now and entry_version == version and (accept is None or accept(value)):
+                return value
+        return None
+
+    def add(self, embedding: Sequence[float], value: Any) -> None:
+        """Store ``value`` under ``embedding``, evicting the oldest entry when full"""
+        vector = self._normalize(embedding)[np.newaxis, :]
+        entry = (time.monotonic() + self.ttl_seconds, data_version(), value)
+        if self._vectors is None or self._vectors.shape[1] != vector.shape[1]:
+            self._vectors, self._entries = vector, [entry]
+            return
+
+        self._vectors = np.vstack((self._vectors, vector))
+        self._entries.append(entry)
+        if len(self._entries) > self.max_entries:
+            self._vectors = self._vectors[1:]
+            self._entries.pop(0)
+
+
+# Redis keys written by redis_cache, and key prefixes of per-request entries,
+# so a data sync can evict them all
+_redis_keys: Set[str] = set()
+_redis_prefixes: Set[str] = set()
+_redis_client = None
+_redis_retry_at = 0.0
+REDIS_RETRY_SECONDS = 30
+
+
+def _get_redis():
+    """Shared Redis client, or None when Redis is unavailable or recently failed"""
+    global _redis_client
+    if not REDIS_AVAILABLE or not settings.REDIS_URL or time.monotonic() < _redis_retry_at:
+        return None
+    if _redis_client is None:
+        _redis_client = aioredis.from_url(
+            settings.REDIS_URL, socket_connect_timeout=0.25, socket_timeout=0.25
+        )
+    return _redis_client
+
+
+def _redis_failed(error: Exception) -> None:
+    """Stop using Redis for a while after an error instead of paying a timeout per call"""
+    global _redis_retry_at
+    logger.warning(f"Redis unavailable, using in-process cache only: {error}")
+    _redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+
+def _dumps(value: Any) -> bytes:
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(value)
+    return json.dumps(value, default=dataclasses.asdict).encode()
+
+
+def _loads(data: bytes) -> Any:
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+async def redis_get(key: str) -> Optional[Any]:
+    """Parsed JSON value stored under ``key``, or None on a miss or without Redis"""
+    client = _get_redis()
+    if client is None:
+        return None
+    try:
+        cached = await client.get(key)
+    except _REDIS_ERRORS as e:
+        _redis_failed(e)
+        return None
+    return None if cached is None else _loads(cached)
+
+
+async def redis_set(key: str, value: Any, ttl_seconds: float) -> None:
+    """Store ``value`` as JSON under ``key``; a no-op without Redis"""
+    client = _get_redis()
+    if client is None:
+        return
+    try:
+        await client.setex(key, int(ttl_seconds), _dumps(value))
+    except _REDIS_ERRORS as e:
+        _redis_failed(e)
+
+
+def register_redis_prefix(prefix: str) -> str:
+    """Mark keys starting with ``prefix`` for eviction by invalidate_redis_cache"""
+    _redis_prefixes.add(prefix)
+    return prefix
+
+
+def redis_cache(key: str, ttl_seconds: float, decode: Optional[Callable[[Any], Any]] = None):
+    """Read-through Redis cache for an async method whose result takes no arguments.
+
+    Results are stored as JSON under ``key`` and ``decode`` rebuilds the value from
+    the parsed JSON. Without Redis the method is simply called; empty results are
+    not cached.
+    """
+    _redis_keys.add(key)
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            cached = await redis_get(key)
+            if cached is not None:
+                return decode(cached) if decode else cached
+
+            value = await func(self, *args, **kwargs)
+            if value:
+                await redis_set(key, value, ttl_seconds)
+            return value
+
+        async def refresh(self, *args, **kwargs):
+            value = await func(self, *args, **kwargs)
+            if value:
+                await redis_set(key, value, ttl_seconds)
+            return value
+
+        wrapper.refresh = refresh
+        return wrapper
+
+    return decorator
+
+
+async def invalidate_redis_cache() -> None:
+    """Delete every key written by redis_cache or under a registered prefix"""
+    client = _get_redis()
+    if client is None:
+        return
+    try:
+        keys = list(_redis_keys)
+        for prefix in _redis_prefixes:
+            keys.extend([key async for key in client.scan_iter(match=f"{prefix}*")])
+        if keys:
+            await client.delete(*keys)
+    except _REDIS_ERRORS as e:
+        _redis_failed(e)
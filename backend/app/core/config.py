@@ -43,6 +43,7 @@ class Settings(BaseSettings):
     
     # Redis Configuration (optional)
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379")
+    REDIS_CACHE_TTL: int = int(os.getenv("FPL_REDIS_CACHE_TTL", "600"))
     
     # Application Settings
     DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
@@ -55,6 +56,21 @@ class Settings(BaseSettings):
     # Data refresh settings
     DATA_REFRESH_INTERVAL_HOURS: int = 6  # Refresh FPL data every 6 hours
 
+    # In-process cache TTLs (seconds) for player/fixture/team reads
+    PLAYER_CACHE_TTL: int = int(os.getenv("FPL_PLAYER_CACHE_TTL", "300"))
+    FIXTURE_CACHE_TTL: int = int(os.getenv("FPL_FIXTURE_CACHE_TTL", "300"))
+    TEAM_CACHE_TTL: int = int(os.getenv("FPL_TEAM_CACHE_TTL", "300"))
+    SQUAD_CACHE_TTL: int = int(os.getenv("FPL_SQUAD_CACHE_TTL", "900"))
+    # Background refresh of the cached player/fixture/team data; keep it below the
+    # cache TTLs so requests never wait on the database (0 disables it)
+    DATA_SNAPSHOT_REFRESH_SECONDS: int = int(os.getenv("FPL_DATA_SNAPSHOT_REFRESH_SECONDS", "240"))
+    TRANSFER_LLM_CACHE_TTL: int = int(os.getenv("FPL_TRANSFER_LLM_CACHE_TTL", "86400"))
+    QUERY_CACHE_TTL: int = int(os.getenv("FPL_QUERY_CACHE_TTL", "900"))
+    # Most chat completions in flight at once, across all requests
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("FPL_LLM_MAX_CONCURRENCY", "8"))
+    # Cache chat completions at any temperature, not just deterministic ones
+    FORCE_LLM_CACHE: bool = os.getenv("FPL_FORCE_LLM_CACHE", "False").lower() == "true"
+
     # CORS Configuration
     BACKEND_CORS_ORIGINS: List[str] = [
         "http://localhost:3000",
@@ -5,6 +5,7 @@ from fastapi import FastAPI
 
 from app.db.database import create_tables
 from app.services.data_sync_service import data_sync_service
+from app.services.ai_service import run_data_refresher
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -16,6 +17,7 @@ async def lifespan(app: FastAPI):
     """
     # Startup
     logger.info("Starting up Fantasy XI Wizard API...")
+    refresher = None
     
     try:
         # Create database tables
@@ -40,6 +42,10 @@ async def lifespan(app: FastAPI):
             logger.info("Production mode: Skipping automatic data sync")
             logger.info("Set up a cron job or task queue for periodic data synchronization")
         
+        # Keep player/fixture data warm in the caches so requests skip the database
+        if settings.DATA_SNAPSHOT_REFRESH_SECONDS > 0:
+            refresher = asyncio.create_task(run_data_refresher(settings.DATA_SNAPSHOT_REFRESH_SECONDS))
+        
         logger.info("Fantasy XI Wizard API startup completed")
         
     except Exception as e:
@@ -50,7 +56,8 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down Fantasy XI Wizard API...")
-    # Add any cleanup tasks here
+    if refresher:
+        refresher.cancel()
     logger.info("Shutdown completed")
 
 async def sync_data_task():
@@ -1,18 +1,43 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from app.core.config import settings
 
-# Create database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    poolclass=StaticPool,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
-    echo=settings.DEBUG
+# Create database engine. SQLite keeps a single shared connection; server databases
+# use a regular connection pool, so sessions in different threads never share a
+# connection or its transaction
+if "sqlite" in settings.DATABASE_URL:
+    engine = create_engine(
+        settings.DATABASE_URL,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+        echo=settings.DEBUG
+    )
+else:
+    engine = create_engine(settings.DATABASE_URL, echo=settings.DEBUG)
+
+# Pragmas applied to every new SQLite connection: WAL lets readers run alongside a
+# writer, and a larger page cache and memory map keep hot tables in memory
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-131072",
+    "PRAGMA mmap_size=268435456",
 )
 
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply SQLITE_PRAGMAS when the pool opens a connection"""
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+if "sqlite" in settings.DATABASE_URL:
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
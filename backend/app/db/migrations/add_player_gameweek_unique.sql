@@ -0,0 +1,10 @@
+-- Migration: Unique (player_id, gameweek) on player_gameweek_stats
+-- Purpose: Let the data sync upsert gameweek stats with ON CONFLICT instead of a lookup per row
+
+-- Keep the earliest row for any player/gameweek pair that was stored more than once
+DELETE FROM player_gameweek_stats
+WHERE id NOT IN (
+    SELECT MIN(id) FROM player_gameweek_stats GROUP BY player_id, gameweek
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_player_gameweek ON player_gameweek_stats (player_id, gameweek);
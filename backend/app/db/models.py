@@ -173,6 +173,11 @@ class PlayerGameweekStats(Base):
     player = relationship("Player", back_populates="gameweek_stats")
     fixture = relationship("Fixture")
 
+    # Constraints
+    __table_args__ = (
+        UniqueConstraint('player_id', 'gameweek', name='uq_player_gameweek'),
+    )
+
 # Historical Data Models for AI Intelligence
 
 class HistoricalPlayerStats(Base):
@@ -4,25 +4,765 @@ Provides intelligent recommendations using OpenAI GPT-4 with real FPL data
 """
 
 import os
+import re
 import json
+import time
 import asyncio
-from typing import List, Dict, Any, Optional
+import heapq
+import bisect
+import hashlib
+import logging
+import functools
+from collections import Counter, defaultdict
+from itertools import islice
+from types import MappingProxyType
+from typing import List, Dict, Any, Optional, Union, Callable, AsyncIterator, Tuple, TYPE_CHECKING
 from datetime import datetime
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.core.cache import (
+    async_ttl_cache, redis_cache, redis_get, redis_set, register_redis_prefix,
+    data_version, SemanticCache, LRUCache
+)
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import Player, Team, Fixture
+from app.services.player_table import get_player_table, PlayerRec, POSITION_CODES
+
+logger = logging.getLogger(__name__)
+
 # Import OpenAI client
 try:
     from openai import AsyncOpenAI
     OPENAI_AVAILABLE = True
 except ImportError:
     OPENAI_AVAILABLE = False
-    print("⚠️ OpenAI package not installed. Install with: pip install openai")
+    logger.warning("OpenAI package not installed. Install with: pip install openai")
+
+# Prefer orjson for LLM payloads, falling back to the standard library
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# The historical AI service is imported on the first player query
+if TYPE_CHECKING:
+    from app.services.historical_ai_service import HistoricalAIService
+
+
+def _json_dumps(data: Any, indent: bool = True) -> str:
+    """Serialize data as JSON for an LLM prompt, indented unless ``indent`` is False"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else None).decode()
+    if indent:
+        return json.dumps(data, indent=2)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def _json_loads(text: str) -> Any:
+    """Parse JSON returned by the LLM (orjson errors subclass json.JSONDecodeError)"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+# JSON extraction from LLM replies: a ```json fenced block, else the first balanced object
+_JSON_CODEBLOCK = re.compile(r'```json\s*(\{.*?\})\s*```', re.DOTALL)
+# Braces and whole string literals, so braces inside strings are skipped
+_JSON_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[{}]')
+
+
+def _extract_json_object(text: str) -> Optional[str]:
+    """Text of the first balanced {...} object in ``text``, found in one forward pass"""
+    start = text.find("{")
+    if start < 0:
+        return None
+    depth = 0
+    for match in _JSON_TOKEN.finditer(text, start):
+        token = match.group()
+        if token == "{":
+            depth += 1
+        elif token == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:match.end()]
+    return None
+
+
+@functools.lru_cache(maxsize=1)
+def _fmt_ts(second: int) -> str:
+    """ISO timestamp for a Unix second, formatted once per second"""
+    return datetime.fromtimestamp(second).isoformat()
+
+
+def _now_iso() -> str:
+    """Current time as an ISO timestamp at one-second resolution"""
+    return _fmt_ts(time.time_ns() // 1_000_000_000)
+
+
+def _envelope(
+    body: Dict[str, Any],
+    user_info: Dict[str, Any],
+    data_source: str,
+    players_analyzed: Optional[int] = None
+) -> Dict[str, Any]:
+    """Add the shared metadata tail to a recommendation in place and return it"""
+    body.update(user_info=user_info, data_source=data_source, generated_at=_now_iso())
+    if players_analyzed is not None:
+        body["players_analyzed"] = players_analyzed
+    return body
+
+
+# FPL element_type -> position
+_POSITION_MAP = {1: "GK", 2: "DEF", 3: "MID", 4: "FWD"}
+
+# FPL squad rule: at most this many players from one team
+_MAX_PER_TEAM = 3
+
+# Query keyword -> tag. Both query helpers classify a query by its set of tags
+_QUERY_KEYWORD_TAGS = {
+    "goalkeeper": "GK", "gk": "GK",
+    "defender": "DEF", "defence": "DEF",
+    "midfielder": "MID", "midfield": "MID",
+    "forward": "FWD", "striker": "FWD",
+    "captain": "CAPTAIN", "who should i captain": "CAPTAIN",
+    "transfer": "TRANSFER", "who should i bring in": "TRANSFER",
+    "best": "PICK", "recommend": "PICK", "pick": "PICK", "team": "PICK",
+    "differential": "DIFFERENTIAL", "template": "DIFFERENTIAL",
+    "fixture": "FIXTURE", "difficulty": "FIXTURE",
+}
+
+# One alternation over every keyword; the lookahead reports overlapping matches too,
+# so a single scan finds everything the per-keyword ``in`` checks would
+_QUERY_KEYWORDS = re.compile(
+    "(?=(" + "|".join(map(re.escape, sorted(_QUERY_KEYWORD_TAGS, key=len, reverse=True))) + "))"
+)
+
+
+@functools.lru_cache(maxsize=256)
+def _query_tags(query_lower: str) -> frozenset:
+    """Tags of every keyword occurring in a lower-cased query"""
+    return frozenset(_QUERY_KEYWORD_TAGS[keyword] for keyword in _QUERY_KEYWORDS.findall(query_lower))
+
+
+# Squad slots per position, in pick order, for the pre-season squad builder
+_SQUAD_SELECTIONS = (("GK", 2), ("DEF", 5), ("MID", 5), ("FWD", 3))
+
+# How many of each position's picks start in the pre-season squad
+_STARTER_COUNT = {"GK": 2, "DEF": 3, "MID": 5, "FWD": 2}
+
+# Share of the remaining budget each position may spend per pick
+_POSITION_BUDGET_RATIO = {
+    "GK": 0.10,   # 10% for goalkeepers
+    "DEF": 0.25,  # 25% for defenders
+    "MID": 0.45,  # 45% for midfielders (most important)
+    "FWD": 0.20   # 20% for forwards
+}
+
+# Cap on a squad pick's predicted points for the period, by position
+_MAX_PREDICTED = {"GK": 30, "DEF": 30, "MID": 40, "FWD": 50}
+
+# LLM squad recommendations, reused for near-identical requests over the same data
+_squad_cache = SemanticCache(threshold=0.93, ttl_seconds=settings.SQUAD_CACHE_TTL)
+_EMBEDDING_MODEL = "text-embedding-3-small"
+
+def _strict_object(properties: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON schema object with every property required, as strict structured outputs expect"""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False
+    }
+
+
+# Structured output contract for the squad LLM. Strict mode does not support
+# minItems/maxItems, so the 15-player count is still enforced by the prompt
+_SQUAD_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "FPLSquad",
+        "strict": True,
+        "schema": _strict_object({
+            "formation": {"type": "string"},
+            "total_cost": {"type": "number"},
+            "budget_used": {"type": "number"},
+            "predicted_points": {"type": "number"},
+            "confidence": {"type": "number"},
+            "players": {
+                "type": "array",
+                "items": _strict_object({
+                    "player_name": {"type": "string"},
+                    "team": {"type": "string"},
+                    "position": {"type": "string", "enum": ["GK", "DEF", "MID", "FWD"]},
+                    "price": {"type": "number"},
+                    "predicted_points": {"type": "number"},
+                    "reasoning": {"type": "string"}
+                })
+            },
+            "analysis": _strict_object({
+                "data_source": {"type": "string"},
+                "players_analyzed": {"type": "integer"},
+                "fixtures_considered": {"type": "integer"},
+                "confidence_score": {"type": "number"},
+                "key_insights": {"type": "array", "items": {"type": "string"}},
+                "captain_recommendation": {"type": "string"},
+                "risk_assessment": {"type": "string"}
+            }),
+            "ai_reasoning": {"type": "string"}
+        })
+    }
+}
+
+# Structured output contract for player query answers, so the reply is decoded with a
+# single parse and needs no shape checks afterwards
+_QUERY_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "FPLQueryAnswer",
+        "strict": True,
+        "schema": _strict_object({
+            "query_type": {"type": "string"},
+            "response": {"type": "string"},
+            "confidence": {"type": "number"},
+            "supporting_data": _strict_object({
+                "key_stats": {"type": "array", "items": {"type": "string"}},
+                "player_recommendations": {"type": "array", "items": {"type": "string"}},
+                "reasoning": {"type": "string"}
+            }),
+            "actionable_advice": {"type": "array", "items": {"type": "string"}}
+        })
+    }
+}
+
+# OpenAI JSON mode, for prompts that describe their JSON shape in the text
+_JSON_OBJECT_FORMAT = {"type": "json_object"}
+
+# Last LLM squads by (budget, formation, gameweeks, data fingerprint), so a repeated
+# request against unchanged data returns at once
+_squad_results = LRUCache(maxsize=64)
+
+# Historical query answers by (data version, normalized query, context digest) ->
+# (expiry, response); a data sync bumps the version, so old answers stop matching
+_query_results = LRUCache(maxsize=512)
+
+# Exact-prompt LLM responses; only used for low-temperature calls unless forced
+_completion_cache = LRUCache(maxsize=512)
+_LLM_CACHE_MAX_TEMPERATURE = 0.2
+
+# Caps concurrent chat completions process-wide so bursts stay under provider rate limits
+_llm_slots = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+
+# Completions in flight by prompt key; identical concurrent requests await the same call
+_inflight_completions: Dict[str, "asyncio.Future[str]"] = {}
+
+# Shared instructions for LLM transfer recommendations. Identical for every user
+# while the player data is unchanged, so the provider can cache the prompt prefix;
+# {top_players} is filled in once per player list
+_TRANSFER_SYSTEM_PROMPT = """You are an expert Fantasy Premier League analyst providing data-driven transfer recommendations. Analyze the user's team in the next message and provide intelligent transfer recommendations.
+
+AVAILABLE PLAYERS (Top performers by position):
+{top_players}
+
+Please provide transfer recommendations considering:
+1. Underperforming players in current squad
+2. Better alternatives available within budget
+3. Upcoming fixture difficulty
+4. Recent transfer patterns and strategy
+5. Value for money and points potential
+
+Respond in JSON format with:
+{
+    "recommendation_type": "fpl_transfers",
+    "priority_transfers": [
+        {
+            "out": {"player_name": "...", "reason": "..."},
+            "in": {"player_name": "...", "reason": "..."},
+            "priority": 1,
+            "cost_change": 0.5,
+            "expected_gain": 8.2,
+            "confidence": 0.85
+        }
+    ],
+    "alternative_strategies": [
+        {
+            "strategy": "...",
+            "reasoning": "...",
+            "transfers": [...]
+        }
+    ],
+    "squad_analysis": {
+        "strengths": ["...", "..."],
+        "weaknesses": ["...", "..."],
+        "overall_rating": 8.5
+    },
+    "ai_summary": "Detailed analysis and recommendations..."
+}"""
+_transfer_system: Dict[str, Any] = {"players": None, "prompt": None}
+
+# Squad fixture text by (squad teams, gameweeks); entries hold the fixture list they
+# were built from and only count as hits for that same list
+_squad_fixture_text = LRUCache(maxsize=2048)
+
+
+@functools.lru_cache(maxsize=4096)
+def _predicted_points(points_per_game: float, form: float, gameweeks: int) -> float:
+    """Predicted points over the next gameweeks, weighting recent form more heavily"""
+    adjusted_ppg = (points_per_game * 0.7) + (form * 0.3)
+    return round(adjusted_ppg * gameweeks, 1)
+
+
+# The fixture list is shared through the fetch cache, so its team index is built once
+_fixture_index: Dict[str, Any] = {"fixtures": None, "index": None}
+
+
+def _team_fixture_index(fixtures: List[Dict]) -> Dict[str, List[int]]:
+    """Team name -> ascending positions of its fixtures in ``fixtures``, home or away"""
+    if _fixture_index["fixtures"] is not fixtures:
+        index = defaultdict(list)
+        for position, fixture in enumerate(fixtures):
+            home_team = fixture.get('team_h_name', '')
+            away_team = fixture.get('team_a_name', '')
+            index[home_team].append(position)
+            if away_team != home_team:
+                index[away_team].append(position)
+        _fixture_index["index"] = dict(index)
+        _fixture_index["fixtures"] = fixtures
+    return _fixture_index["index"]
+
+
+@functools.lru_cache(maxsize=2048)
+def _squad_performance_text(rows: Tuple[Tuple[Any, ...], ...]) -> str:
+    """Squad performance summary from (player_name, total_points, form, price) rows"""
+    analysis = []
+    total_points = sum(row[1] for row in rows)
+    avg_form = sum(row[2] for row in rows) / len(rows) if rows else 0
 
-# Import the new historical AI service
-from app.services.historical_ai_service import HistoricalAIService
+    analysis.append(f"Squad Total Points: {total_points}")
+    analysis.append(f"Average Form: {avg_form:.1f}")
+
+    # Find underperformers
+    underperformers = [name for name, points, form, price in rows if form < 3.0 or
+                       (points / max(price, 1) < 15)]
+
+    if underperformers:
+        analysis.append(f"Underperformers: {', '.join(underperformers)}")
+
+    return "\n".join(analysis)
+
+
+def _data_fingerprint(players: List[PlayerRec]) -> str:
+    """Cheap identifier for the loaded player data, used to key cached LLM results"""
+    table = get_player_table(players)
+    summary = f"{data_version()}:{len(table)}:{table.total_points.sum()}:{table.price.sum()}"
+    return hashlib.blake2b(summary.encode(), digest_size=16).hexdigest()
+
+
+def _query_cache_key(query: str, context: Optional[Dict]) -> Tuple[int, str, str]:
+    """Key for a player query: repeated questions differing only in case or padding match"""
+    context_digest = ""
+    if context:
+        payload = json.dumps(context, sort_keys=True, default=str)
+        context_digest = hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()
+    return data_version(), query.strip().lower(), context_digest
+
+
+# Parsed LLM transfer advice in Redis, keyed by squad and request settings
+_TRANSFER_CACHE_PREFIX = register_redis_prefix("llm_rec:")
+
+
+def _transfer_cache_key(squad: List[Dict], bank: float, free_transfers: int, gameweeks: int, model: str) -> str:
+    """Redis key for LLM transfer advice; squad order does not matter"""
+    ids = sorted(str(player.get("player_id") or player.get("player_name", "")) for player in squad)
+    payload = json.dumps(
+        {"ids": ids, "bank": bank, "ft": free_transfers, "gw": gameweeks, "m": model},
+        sort_keys=True
+    )
+    return _TRANSFER_CACHE_PREFIX + hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _decode_players(rows: List[Dict[str, Any]]) -> List[PlayerRec]:
+    """Rebuild player records from their cached JSON form"""
+    return [PlayerRec(**row) for row in rows]
+
+
+# Static reference data, built once at import instead of on every call
+_HISTORICAL_CAPTAINS = {
+    "top_captains_last_season": [
+        {"name": "Haaland", "avg_points": 12.8, "home_avg": 14.2, "away_avg": 11.4, "15_plus_games": 8},
+        {"name": "Palmer", "avg_points": 11.2, "home_avg": 12.1, "away_avg": 10.3, "15_plus_games": 5},
+        {"name": "Saka", "avg_points": 10.5, "home_avg": 11.8, "away_avg": 9.2, "15_plus_games": 4}
+    ],
+    "penalty_takers": ["Palmer", "Saka", "Salah"],
+    "home_specialists": ["Haaland", "Saka", "Son"],
+    "differential_captains": ["Palmer", "Watkins", "Isak"]
+}
+
+# Fallback responses for when the database is unavailable. Read-only templates:
+# callers copy the top level and override the request-specific fields
+_FALLBACK_SQUAD = MappingProxyType({
+    "recommendation_type": "squad_selection",
+    "predicted_points": 180.0,
+    "confidence": 0.75,
+    "players": (
+        {"player_name": "Haaland", "team": "Manchester City", "position": "FWD", "price": 15.0, "predicted_points": 12.5},
+        {"player_name": "Salah", "team": "Liverpool", "position": "MID", "price": 13.0, "predicted_points": 11.8},
+        {"player_name": "Palmer", "team": "Chelsea", "position": "MID", "price": 11.0, "predicted_points": 10.2},
+        {"player_name": "Saka", "team": "Arsenal", "position": "MID", "price": 10.0, "predicted_points": 9.5},
+        {"player_name": "Mbeumo", "team": "Brentford", "position": "MID", "price": 7.5, "predicted_points": 8.2},
+        {"player_name": "Cunha", "team": "Wolves", "position": "FWD", "price": 6.5, "predicted_points": 7.8},
+        {"player_name": "Gabriel", "team": "Arsenal", "position": "DEF", "price": 6.0, "predicted_points": 6.5},
+        {"player_name": "Gvardiol", "team": "Manchester City", "position": "DEF", "price": 5.5, "predicted_points": 6.2},
+        {"player_name": "Lewis", "team": "Newcastle", "position": "DEF", "price": 4.5, "predicted_points": 5.8},
+        {"player_name": "Raya", "team": "Arsenal", "position": "GKP", "price": 5.5, "predicted_points": 5.5},
+        {"player_name": "Fabianski", "team": "West Ham", "position": "GKP", "price": 4.0, "predicted_points": 4.2}
+    ),
+    "analysis": {
+        "data_source": "fallback_recommendation",
+        "confidence_score": 0.75,  # Frontend expects this field
+        "key_insights": [
+            "Quick recommendation based on popular picks",
+            "Balanced formation with premium attackers",
+            "Good value options in midfield and defense"
+        ],
+        "captain_recommendation": "Haaland",
+        "risk_assessment": "Medium - safe popular picks"
+    },
+    "data_source": "fallback_data"
+})
+
+_FALLBACK_TRANSFERS = MappingProxyType({
+    "recommendation_type": "transfers",
+    "transfers_suggested": 1,
+    "transfers": (
+        {
+            "out": {
+                "player_name": "Rashford",
+                "team": "Manchester Utd",
+                "position": "MID",
+                "price": 8.5,
+                "recent_form": 2.8,
+                "total_points": 45,
+                "reason_to_sell": "Poor recent form and difficult fixtures"
+            },
+            "in": {
+                "player_name": "Palmer",
+                "team": "Chelsea",
+                "position": "MID",
+                "price": 11.0,
+                "predicted_points": 25,
+                "confidence": 0.88,
+                "form": 8.2,
+                "total_points": 156
+            },
+            "reasoning": "Palmer has excellent underlying stats, penalty duties, and favorable fixtures. Strong form suggests continued returns.",
+            "priority": 1,
+            "expected_gain": 8.5,
+            "cost_change": 2.5
+        },
+    ),
+    "analysis": {
+        "total_expected_gain": 8.5,
+        "risk_assessment": "Medium - Premium price but strong underlying data",
+        "form_analysis": "Prioritized players with strong recent form",
+        "data_source": "fallback_recommendation"
+    },
+    "alternatives": (
+        {
+            "option": "Budget option: Rashford → Mbeumo",
+            "reasoning": "Lower cost alternative with good recent form",
+            "expected_gain": 6.2
+        },
+    ),
+    "ai_summary": "Palmer represents excellent value despite premium price. Strong form, penalty duties, and favorable fixtures make this a priority transfer."
+})
+
+_FALLBACK_FPL_TRANSFERS = MappingProxyType({
+    "recommendation_type": "fpl_transfers",
+    "priority_transfers": (
+        {
+            "out": {
+                "player_name": "Underperforming Player",
+                "reason": "Poor recent form and fixtures"
+            },
+            "in": {
+                "player_name": "Palmer",
+                "reason": "Excellent form and favorable fixtures"
+            },
+            "priority": 1,
+            "cost_change": 2.5,
+            "expected_gain": 8.5,
+            "confidence": 0.80
+        },
+    ),
+    "alternative_strategies": (
+        {
+            "strategy": "Wait and see",
+            "reasoning": "Monitor player performances for another gameweek",
+            "transfers": ()
+        },
+    ),
+    "squad_analysis": {
+        "strengths": ("Unable to analyze - data unavailable",),
+        "weaknesses": ("Unable to analyze - data unavailable",),
+        "overall_rating": 7.0
+    },
+    "free_transfers_used": 1,
+    "data_source": "fallback_recommendation",
+    "ai_summary": "Unable to fetch current data. Consider popular transfers like bringing in Palmer for consistent returns."
+})
+
+_FALLBACK_PRE_SEASON = MappingProxyType({
+    "recommendation_type": "pre_season_squad",
+    "squad_recommendation": {
+        "formation": "3-5-2",
+        "total_cost": 100.0,
+        "players": (
+            {"player_name": "Haaland", "position": "FWD", "team": "Manchester City", "price": 15.0, "reasoning": "Premium striker with highest ceiling", "starter": True},
+            {"player_name": "Salah", "position": "MID", "team": "Liverpool", "price": 13.0, "reasoning": "Consistent performer with penalty duties", "starter": True},
+            {"player_name": "Palmer", "position": "MID", "team": "Chelsea", "price": 11.0, "reasoning": "Excellent value with penalty duties", "starter": True},
+            {"player_name": "Saka", "position": "MID", "team": "Arsenal", "price": 10.0, "reasoning": "Reliable returns from top team", "starter": True},
+            {"player_name": "Mbeumo", "position": "MID", "team": "Brentford", "price": 7.5, "reasoning": "Great value midfielder", "starter": True},
+            {"player_name": "Cunha", "position": "FWD", "team": "Wolves", "price": 6.5, "reasoning": "Value forward option", "starter": True},
+            {"player_name": "Gabriel", "position": "DEF", "team": "Arsenal", "price": 6.0, "reasoning": "Attacking defender from top team", "starter": True},
+            {"player_name": "Gvardiol", "position": "DEF", "team": "Manchester City", "price": 5.5, "reasoning": "Attacking threat from fullback", "starter": True},
+            {"player_name": "Lewis", "position": "DEF", "team": "Newcastle", "price": 4.5, "reasoning": "Budget defender with potential", "starter": True}
+        )
+    },
+    "key_strategies": (
+        "Premium attackers for high ceiling",
+        "Value picks in midfield and defense",
+        "Focus on penalty takers",
+        "Target players with good opening fixtures"
+    ),
+    "transfer_targets": (
+        {
+            "gameweek": 3,
+            "target": "Monitor early season form",
+            "reasoning": "Assess performances before making changes"
+        },
+    ),
+    "data_source": "fallback_recommendation"
+})
+
+_FALLBACK_CAPTAIN = MappingProxyType({
+    "recommendation_type": "captaincy",
+    "recommendations": (
+        {
+            "player_name": "Haaland",
+            "team": "Manchester City",
+            "position": "FWD",
+            "confidence": 0.90,
+            "predicted_points": 14,
+            "reasoning": "Premium striker with excellent goal scoring record. Consistent captain choice.",
+            "fixture": "Manchester City vs TBD (H)",
+            "fixture_difficulty": 2,
+            "form_score": 8.5,
+            "ownership": "45%",
+            "historical_performance": "Averages 12+ points as captain"
+        },
+        {
+            "player_name": "Salah",
+            "team": "Liverpool",
+            "position": "MID",
+            "confidence": 0.85,
+            "predicted_points": 12,
+            "reasoning": "Reliable midfielder with penalty duties. Strong home record.",
+            "fixture": "Liverpool vs TBD (H)",
+            "fixture_difficulty": 2,
+            "form_score": 7.8,
+            "ownership": "35%",
+            "historical_performance": "Consistent double-digit returns"
+        },
+        {
+            "player_name": "Palmer",
+            "team": "Chelsea",
+            "position": "MID",
+            "confidence": 0.80,
+            "predicted_points": 11,
+            "reasoning": "In excellent form with penalty duties. Good differential option.",
+            "fixture": "Chelsea vs TBD (H)",
+            "fixture_difficulty": 3,
+            "form_score": 8.2,
+            "ownership": "25%",
+            "historical_performance": "Strong underlying stats"
+        }
+    ),
+    "analysis": {
+        "data_source": "fallback_recommendation",
+        "safe_pick": "Haaland",
+        "differential_pick": "Palmer",
+        "avoid": ("Rotation risks", "Difficult away fixtures"),
+        "key_factors": (
+            "Form and goal scoring record",
+            "Fixture difficulty",
+            "Ownership for differential opportunities"
+        )
+    },
+    "ai_summary": "Haaland remains the safest captain choice with 90% confidence. Palmer offers good differential value at lower ownership. Avoid rotation-prone players.",
+    "data_source": "fallback_data"
+})
+
+# Canned answers for the keyword-matched player queries when no LLM is configured
+_MOCK_TRANSFER_REPLY = MappingProxyType({
+    "query_type": "transfer_advice",
+    "response": "Based on historical performance and upcoming fixtures, I'd prioritize Palmer and Mbeumo as transfer targets. Palmer scored 22 goals + 11 assists last season and is on penalties, while Mbeumo has 8 goals in his last 6 games and historically overperforms in favorable fixtures.",
+    "confidence": 0.87,
+    "supporting_data": {
+        "palmer_historical": "22 goals + 11 assists last season, 9/9 penalties scored",
+        "mbeumo_form": "8 goals in last 6 games, 3.2 xG indicates sustainability",
+        "fixture_analysis": "Both have historically performed well vs upcoming opponents",
+        "value_analysis": "Palmer £11.0m (premium but essential), Mbeumo £7.5m (excellent value)"
+    },
+    "transfer_priorities": (
+        {"player": "Palmer", "priority": 1, "reasoning": "Essential due to penalties and underlying stats"},
+        {"player": "Mbeumo", "priority": 2, "reasoning": "Exceptional value with strong recent form"},
+        {"player": "Saka", "priority": 3, "reasoning": "Consistent performer with good home record"}
+    )
+})
+
+_MOCK_PICK_REPLY = MappingProxyType({
+    "query_type": "general_recommendation",
+    "response": "For the upcoming gameweek, focus on players with strong home fixtures and historical performance. Haaland (36 goals last season), Palmer (22 goals + 11 assists), and Saka (16 goals + 9 assists) are premium options. For value, consider Mbeumo (8 goals in 6 games) and Rogers (4 assists in 5 games).",
+    "confidence": 0.88,
+    "key_picks": (
+        {"name": "Haaland", "price": "£15.0m", "reasoning": "36 goals last season, averages 2.1 goals vs upcoming opponent"},
+        {"name": "Palmer", "price": "£11.0m", "reasoning": "22 goals + 11 assists last season, on penalties"},
+        {"name": "Mbeumo", "price": "£7.5m", "reasoning": "8 goals in 6 games, historically strong in good fixtures"},
+        {"name": "Saka", "price": "£10.0m", "reasoning": "16 goals + 9 assists last season, excellent home record"}
+    ),
+    "formation_advice": "3-5-2 recommended for midfield strength with premium forwards"
+})
+
+_MOCK_DIFFERENTIAL_REPLY = MappingProxyType({
+    "query_type": "differential_advice",
+    "response": "For differentials, consider Palmer (28.7% ownership vs 45.2% for Haaland), Watkins (strong home record, 19 goals last season), or Isak (Newcastle's main threat). Avoid template picks if you need to climb ranks.",
+    "confidence": 0.82,
+    "differential_picks": (
+        {"name": "Palmer", "ownership": "28.7%", "reasoning": "Lower owned than Haaland but similar ceiling"},
+        {"name": "Watkins", "ownership": "22.1%", "reasoning": "19 goals last season, strong home record"},
+        {"name": "Isak", "ownership": "18.5%", "reasoning": "Newcastle's main threat, good fixtures ahead"}
+    ),
+    "template_warning": "High ownership players (Haaland 45.2%, Saka 52.1%) are safer but offer less rank climbing potential"
+})
+
+_MOCK_FIXTURE_REPLY = MappingProxyType({
+    "query_type": "fixture_analysis",
+    "response": "This gameweek favors home teams with Arsenal, Chelsea, and Man City all playing at home. Historically, these teams score 2+ goals in 70%+ of home games. Avoid away players vs strong defenses.",
+    "confidence": 0.85,
+    "fixture_insights": (
+        {"team": "Arsenal", "fixture": "vs Leicester (H)", "historical": "Scored 2+ goals in 18/19 home games last season"},
+        {"team": "Man City", "fixture": "vs Bournemouth (H)", "historical": "Averaged 3.2 goals at home vs promoted teams"},
+        {"team": "Chelsea", "fixture": "vs Brentford (H)", "historical": "Won 8/10 recent home games vs Brentford"}
+    )
+})
+
+_MOCK_GENERAL_REPLY = MappingProxyType({
+    "query_type": "general_analysis",
+    "confidence": 0.78,
+    "suggestions": (
+        "Prioritize home players - they averaged 2.3 more points last season",
+        "Target penalty takers for higher floor (Palmer, Saka, Salah)",
+        "Check historical head-to-head records vs upcoming opponents",
+        "Balance premium picks (proven performers) with value options (form players)"
+    ),
+    "historical_context": "Analysis based on 2024-25 season data and similar gameweek patterns"
+})
+
+# Transfer reasoning and summary text, filled in with str.format_map
+_TRANSFER_REASONING = (
+    "{name} has superior form ({in_form} vs {out_form}) and better underlying stats. "
+    "Expected to outperform over next few gameweeks."
+)
+_TRANSFER_SUMMARY = (
+    "Priority transfer is {out_name} to {in_name} - "
+    "form and fixture analysis strongly supports this move. "
+    "Consider timing based on price change predictions and injury news."
+)
+_TRANSFER_SUMMARY_MULTIPLE = (
+    "Priority transfer is {out_name} to {in_name} - "
+    "form and fixture analysis strongly supports this move. "
+    "Secondary transfer also recommended for additional value. "
+    "Consider timing based on price change predictions and injury news."
+)
+
+# Captain reasoning text, filled in with % from a (form, goals, assists, total points) tuple
+_CAPTAIN_REASONING = "Strong form (%s) with %s goals and %s assists. Total points: %s"
+
+# Player query prompt, filled in with str.format_map
+_QUERY_PROMPT = """
+You are an expert Fantasy Premier League (FPL) analyst. Answer the user's question using the real FPL data provided.
+
+USER QUESTION: "{query}"
+CONTEXT: {context}
+
+RELEVANT PLAYER DATA:
+{players}
+
+UPCOMING FIXTURES:
+{fixtures}
+
+Please provide a JSON response with the following structure:
+{{
+    "query_type": "descriptive_category",
+    "response": "Detailed answer based on real data",
+    "confidence": <0.0_to_1.0>,
+    "supporting_data": {{
+        "key_stats": ["stat1", "stat2", "stat3"],
+        "player_recommendations": ["player1", "player2"],
+        "reasoning": "Why these recommendations"
+    }},
+    "actionable_advice": ["specific action 1", "specific action 2"]
+}}
+
+Base your answer on the real data provided. Include specific statistics, player names, and concrete recommendations.
+"""
+
+# Chip recommendations as (gameweek offset, recommendation) pairs
+_CHIP_RECOMMENDATIONS = (
+    (2, {
+        "chip": "Triple Captain",
+        "confidence": 0.85,
+        "reasoning": "Double gameweek with Haaland having two home fixtures",
+        "best_targets": ["Haaland", "Salah", "Palmer"],
+        "expected_gain": 15.5
+    }),
+    (5, {
+        "chip": "Bench Boost",
+        "confidence": 0.78,
+        "reasoning": "Build strong bench during international break",
+        "preparation_needed": "Invest in playing bench players",
+        "expected_gain": 12.8
+    }),
+    (8, {
+        "chip": "Free Hit",
+        "confidence": 0.72,
+        "reasoning": "Blank gameweek with limited fixtures",
+        "strategy": "Target teams with fixtures in blank gameweek",
+        "expected_gain": 20.2
+    })
+)
+
+_CHIP_STRATEGY = {
+    "recommendation_type": "chip_strategy",
+    "analysis": {
+        "priority_order": ["Triple Captain", "Bench Boost", "Free Hit"],
+        "timing_importance": "High - Chip timing can swing ranks significantly",
+        "preparation_tips": [
+            "Monitor double gameweek announcements",
+            "Build bench strength 2-3 weeks before Bench Boost",
+            "Save Free Hit for biggest blank gameweek"
+        ]
+    },
+    "ai_summary": "Triple Captain in the upcoming double gameweek offers the best immediate value. Plan bench investments for Bench Boost, and save Free Hit for the major blank gameweek."
+}
 
 class AIService:
-    def __init__(self, db: Session = None):
+    def __init__(self, db: Union[Session, AsyncSession] = None):
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.model = "gpt-4o-mini"  # Use the more cost-effective model
         self.db = db
@@ -34,142 +774,339 @@ class AIService:
         else:
             self.client = None
             self.use_llm = False
-            print("⚠️ OpenAI not configured, using mock responses")
+            logger.warning("OpenAI not configured, using mock responses")
 
-    async def _fetch_real_player_data(self) -> List[Dict[str, Any]]:
-        """Fetch real player data from database"""
-        if not self.db:
-            return []
+        # Created on first use; only the player query path needs it
+        self._historical_ai: Optional["HistoricalAIService"] = None
 
+    async def _create_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        no_cache: bool = False,
+        on_token: Optional[Callable[[str], None]] = None,
+        response_format: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Run a chat completion, reusing the response for an identical deterministic prompt
+
+        When ``on_token`` is given the completion is streamed and each piece of text is
+        passed to it as it arrives; the full text is still returned at the end.
+
+        Identical requests already in flight share one API call unless ``no_cache`` is
+        set, and at most ``LLM_MAX_CONCURRENCY`` calls run at once.
+        """
+        use_cache = not no_cache and (
+            temperature <= _LLM_CACHE_MAX_TEMPERATURE or settings.FORCE_LLM_CACHE
+        )
+        # Whitespace-only differences in the prompt map to the same key
+        normalized = [[m["role"], " ".join(m["content"].split())] for m in messages]
+        key = hashlib.sha256(
+            json.dumps([self.model, normalized, temperature, max_tokens, response_format]).encode()
+        ).hexdigest()
+        if use_cache:
+            cached = _completion_cache.get(key)
+            if cached is not None:
+                if on_token:
+                    on_token(cached)
+                return cached
+
+        if no_cache:
+            async with _llm_slots:
+                return await self._request_completion(messages, temperature, max_tokens, on_token, response_format)
+
+        while (pending := _inflight_completions.get(key)) is not None:
+            try:
+                # Shielded so a cancelled waiter does not cancel the shared call
+                content = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # The leader was cancelled rather than this task: make the call again
+                if pending.cancelled() and not asyncio.current_task().cancelling():
+                    continue
+                raise
+            if on_token:
+                on_token(content)
+            return content
+
+        future = asyncio.get_running_loop().create_future()
+        _inflight_completions[key] = future
         try:
-            from app.db.models import Player, Team
+            async with _llm_slots:
+                content = await self._request_completion(messages, temperature, max_tokens, on_token, response_format)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved; waiters, if any, still receive it
+            raise
+        except BaseException:
+            # Cancellation belongs to this task only; waiters retry the call themselves
+            future.cancel()
+            raise
+        else:
+            future.set_result(content)
+        finally:
+            del _inflight_completions[key]
 
-            # Get all players with their teams
-            players = self.db.query(Player).join(Team).all()
+        if use_cache and content:
+            _completion_cache.set(key, content)
+        return content
 
-            player_data = []
-            for player in players:
-                # Map element_type to position
-                position_map = {1: "GK", 2: "DEF", 3: "MID", 4: "FWD"}
-                position = position_map.get(player.element_type, "Unknown")
+    async def _request_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        on_token: Optional[Callable[[str], None]],
+        response_format: Optional[Dict[str, Any]]
+    ) -> str:
+        """Make one chat completion API call, streaming to ``on_token`` when given"""
+        options = {"response_format": response_format} if response_format else {}
+        if on_token:
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                **options
+            )
+            parts = []
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    on_token(delta)
+            return "".join(parts)
+
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **options
+        )
+        return response.choices[0].message.content
+
+    async def _embed(self, text: str) -> Optional[List[float]]:
+        """Embed text for semantic cache lookups, or None if embeddings are unavailable"""
+        try:
+            response = await self.client.embeddings.create(model=_EMBEDDING_MODEL, input=text)
+            return response.data[0].embedding
+        except Exception as e:
+            logger.error(f"Error creating embedding: {e}")
+            return None
 
-                # Convert price from 0.1m units to actual price
-                price = player.now_cost / 10.0
+    async def _run_query(self, statement, build):
+        """Execute a select and convert its result without blocking the event loop
 
-                player_data.append({
-                    "id": player.id,
-                    "name": f"{player.first_name} {player.second_name}",
-                    "web_name": player.web_name,
-                    "team": player.team.name,
-                    "position": position,
-                    "element_type": player.element_type,
-                    "price": price,
-                    "total_points": player.total_points,
-                    "form": player.form,
-                    "goals_scored": player.goals_scored,
-                    "assists": player.assists,
-                    "clean_sheets": player.clean_sheets,
-                    "minutes": player.minutes,
-                    "selected_by_percent": player.selected_by_percent,
-                    "points_per_game": player.points_per_game,
-                    "expected_goals": player.expected_goals,
-                    "expected_assists": player.expected_assists,
-                    "status": player.status,
-                    "news": player.news
-                })
+        Each call uses a session of its own so concurrent fetches never share one.
+        Async sessions are awaited directly; sync sessions run in a worker thread.
+        """
+        if isinstance(self.db, AsyncSession):
+            async with AsyncSession(self.db.bind) as session:
+                return build(await session.execute(statement))
+
+        def run():
+            with Session(bind=self.db.get_bind()) as session:
+                return build(session.execute(statement))
 
-            return player_data
+        return await asyncio.to_thread(run)
+
+    @async_ttl_cache(ttl_seconds=settings.PLAYER_CACHE_TTL)
+    @redis_cache("players:v1", ttl_seconds=settings.REDIS_CACHE_TTL, decode=_decode_players)
+    async def _fetch_real_player_data(self) -> List[PlayerRec]:
+        """Fetch real player data from database"""
+        if not self.db:
+            return []
+
+        try:
+            # Get all players with their team name in a single query, projecting only
+            # the columns used below instead of hydrating full ORM objects
+            statement = select(
+                Player.id,
+                Player.first_name,
+                Player.second_name,
+                Player.web_name,
+                Player.element_type,
+                Player.now_cost,
+                Player.total_points,
+                Player.form,
+                Player.goals_scored,
+                Player.assists,
+                Player.clean_sheets,
+                Player.minutes,
+                Player.selected_by_percent,
+                Player.points_per_game,
+                Player.expected_goals,
+                Player.expected_assists,
+                Player.status,
+                Player.news,
+                Team.name.label("team_name")
+            ).join(Team)
+
+            return await self._run_query(statement, self._build_player_data)
         except Exception as e:
-            print(f"Error fetching player data: {e}")
+            logger.error(f"Error fetching player data: {e}")
             return []
 
+    def _build_player_data(self, result) -> List[PlayerRec]:
+        """Convert player rows into player records"""
+        player_data = []
+        for player in result:
+            # Map element_type to position
+            position = _POSITION_MAP.get(player.element_type, "Unknown")
+
+            # Convert price from 0.1m units to actual price
+            price = player.now_cost / 10.0
+
+            player_data.append(PlayerRec(
+                id=player.id,
+                name=f"{player.first_name} {player.second_name}",
+                web_name=player.web_name,
+                team=player.team_name,
+                position=position,
+                element_type=player.element_type,
+                price=price,
+                total_points=player.total_points,
+                form=player.form,
+                goals_scored=player.goals_scored,
+                assists=player.assists,
+                clean_sheets=player.clean_sheets,
+                minutes=player.minutes,
+                selected_by_percent=player.selected_by_percent,
+                points_per_game=player.points_per_game,
+                expected_goals=player.expected_goals,
+                expected_assists=player.expected_assists,
+                status=player.status,
+                news=player.news
+            ))
+
+        return player_data
+
+    @async_ttl_cache(ttl_seconds=settings.FIXTURE_CACHE_TTL)
+    @redis_cache("fixtures:v1", ttl_seconds=settings.REDIS_CACHE_TTL)
     async def _fetch_real_fixture_data(self) -> List[Dict[str, Any]]:
         """Fetch real fixture data from database"""
         if not self.db:
             return []
 
         try:
-            from app.db.models import Fixture, Team
+            # Resolve team names from one small lookup instead of per-fixture relationships
+            team_names = await self._run_query(select(Team.id, Team.name), lambda result: dict(result.all()))
 
             # Get upcoming fixtures (not finished)
-            fixtures = self.db.query(Fixture).filter(
+            statement = select(
+                Fixture.id,
+                Fixture.event,
+                Fixture.team_h_id,
+                Fixture.team_a_id,
+                Fixture.team_h_difficulty,
+                Fixture.team_a_difficulty,
+                Fixture.kickoff_time,
+                Fixture.finished,
+                Fixture.started
+            ).where(
                 Fixture.finished == False
-            ).limit(20).all()  # Get next 20 fixtures
-
-            fixture_data = []
-            for fixture in fixtures:
-                # Get team names through relationships
-                home_team = fixture.team_home.name if fixture.team_home else "Unknown"
-                away_team = fixture.team_away.name if fixture.team_away else "Unknown"
-
-                fixture_data.append({
-                    "id": fixture.id,
-                    "gameweek": fixture.event,
-                    "team_h": home_team,
-                    "team_a": away_team,
-                    "team_h_id": fixture.team_h_id,
-                    "team_a_id": fixture.team_a_id,
-                    "team_h_difficulty": fixture.team_h_difficulty,
-                    "team_a_difficulty": fixture.team_a_difficulty,
-                    "kickoff_time": fixture.kickoff_time.isoformat() if fixture.kickoff_time else None,
-                    "finished": fixture.finished,
-                    "started": fixture.started
-                })
+            ).limit(20)  # Get next 20 fixtures
 
-            return fixture_data
+            return await self._run_query(
+                statement, lambda result: self._build_fixture_data(result, team_names)
+            )
         except Exception as e:
-            print(f"Error fetching fixture data: {e}")
+            logger.error(f"Error fetching fixture data: {e}")
             return []
 
+    def _build_fixture_data(self, result, team_names: Dict[int, str]) -> List[Dict[str, Any]]:
+        """Convert fixture rows into fixture dicts"""
+        fixture_data = []
+        for fixture in result:
+            home_team = team_names.get(fixture.team_h_id, "Unknown")
+            away_team = team_names.get(fixture.team_a_id, "Unknown")
+
+            fixture_data.append({
+                "id": fixture.id,
+                "gameweek": fixture.event,
+                "team_h": home_team,
+                "team_a": away_team,
+                "team_h_id": fixture.team_h_id,
+                "team_a_id": fixture.team_a_id,
+                "team_h_difficulty": fixture.team_h_difficulty,
+                "team_a_difficulty": fixture.team_a_difficulty,
+                "kickoff_time": fixture.kickoff_time.isoformat() if fixture.kickoff_time else None,
+                "finished": fixture.finished,
+                "started": fixture.started
+            })
+
+        return fixture_data
+
+    @async_ttl_cache(ttl_seconds=settings.TEAM_CACHE_TTL)
+    @redis_cache("teams:v1", ttl_seconds=settings.REDIS_CACHE_TTL)
     async def _fetch_real_team_data(self) -> List[Dict[str, Any]]:
         """Fetch real team data from database"""
         if not self.db:
             return []
 
         try:
-            from app.db.models import Team
-
-            teams = self.db.query(Team).all()
-
-            team_data = []
-            for team in teams:
-                team_data.append({
-                    "id": team.id,
-                    "name": team.name,
-                    "short_name": team.short_name,
-                    "strength": team.strength,
-                    "strength_overall_home": team.strength_overall_home,
-                    "strength_overall_away": team.strength_overall_away,
-                    "strength_attack_home": team.strength_attack_home,
-                    "strength_attack_away": team.strength_attack_away,
-                    "strength_defence_home": team.strength_defence_home,
-                    "strength_defence_away": team.strength_defence_away
-                })
-
-            return team_data
+            return await self._run_query(select(Team), self._build_team_data)
         except Exception as e:
-            print(f"Error fetching team data: {e}")
+            logger.error(f"Error fetching team data: {e}")
             return []
 
+    def _build_team_data(self, result) -> List[Dict[str, Any]]:
+        """Convert team rows into team dicts"""
+        team_data = []
+        for team in result.scalars():
+            team_data.append({
+                "id": team.id,
+                "name": team.name,
+                "short_name": team.short_name,
+                "strength": team.strength,
+                "strength_overall_home": team.strength_overall_home,
+                "strength_overall_away": team.strength_overall_away,
+                "strength_attack_home": team.strength_attack_home,
+                "strength_attack_away": team.strength_attack_away,
+                "strength_defence_home": team.strength_defence_home,
+                "strength_defence_away": team.strength_defence_away
+            })
+
+        return team_data
+
+    async def _fetch_players_and_fixtures(self) -> Tuple[List[PlayerRec], List[Dict[str, Any]]]:
+        """Fetch players and fixtures concurrently under one 5 second timeout"""
+        players, fixtures = await asyncio.wait_for(
+            asyncio.gather(self._fetch_real_player_data(), self._fetch_real_fixture_data()),
+            timeout=5.0
+        )
+        return players, fixtures
+
     async def get_squad_recommendation(
         self,
         budget: float = 100.0,
         formation: str = "3-5-2",
         gameweeks: int = 3,
-        user_preferences: Optional[Dict] = None
+        user_preferences: Optional[Dict] = None,
+        no_cache: bool = False,
+        on_token: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
         """Generate AI-powered squad recommendations using real FPL data and LLM analysis"""
 
         try:
-            # Fetch real data from database with timeout
-            players = await asyncio.wait_for(self._fetch_real_player_data(), timeout=5.0)
-            fixtures = await asyncio.wait_for(self._fetch_real_fixture_data(), timeout=3.0)
-            teams = await asyncio.wait_for(self._fetch_real_team_data(), timeout=2.0)
+            # Fetch real data from database concurrently, with one overall timeout
+            players, fixtures, teams = await asyncio.wait_for(
+                asyncio.gather(
+                    self._fetch_real_player_data(),
+                    self._fetch_real_fixture_data(),
+                    self._fetch_real_team_data()
+                ),
+                timeout=6.0
+            )
 
             # Use LLM for dynamic squad generation if available
             if self.use_llm and self.client:
                 return await self._generate_llm_squad_recommendation(
-                    players, fixtures, teams, budget, formation, gameweeks
+                    players, fixtures, teams, budget, formation, gameweeks,
+                    no_cache=no_cache, on_token=on_token
                 )
             else:
                 # Fallback to enhanced algorithm
@@ -177,12 +1114,65 @@ class AIService:
                     players, fixtures, teams, budget, formation, gameweeks
                 )
         except asyncio.TimeoutError:
-            print("⚠️ Database query timeout, using fallback data")
+            logger.warning("Database query timeout, using fallback data")
             return await self._generate_fallback_squad_recommendation(budget, formation, gameweeks)
         except Exception as e:
-            print(f"Error in squad recommendation: {e}")
+            logger.error(f"Error in squad recommendation: {e}")
             return await self._generate_fallback_squad_recommendation(budget, formation, gameweeks)
 
+    async def stream_squad_recommendation(
+        self,
+        budget: float = 100.0,
+        formation: str = "3-5-2",
+        gameweeks: int = 3,
+        user_preferences: Optional[Dict] = None,
+        no_cache: bool = False
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Yield ("token", text) as the LLM writes the squad, then ("result", recommendation)"""
+        async for event in self._stream_tokens(lambda on_token: self.get_squad_recommendation(
+            budget, formation, gameweeks, user_preferences,
+            no_cache=no_cache, on_token=on_token
+        )):
+            yield event
+
+    async def stream_player_query(
+        self,
+        query: str,
+        context: Optional[Dict] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Yield ("token", text) as the LLM answers a player query, then ("result", response)
+
+        Streams the data-backed query path; without an LLM only the result is sent.
+        """
+        async for event in self._stream_tokens(
+            lambda on_token: self._analyze_player_query_fallback(query, context, on_token=on_token)
+        ):
+            yield event
+
+    async def _stream_tokens(
+        self,
+        start: Callable[[Callable[[str], None]], Any]
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Run ``start(on_token)`` as a task, yielding its tokens and then its result"""
+        tokens: asyncio.Queue = asyncio.Queue()
+        task = asyncio.create_task(start(tokens.put_nowait))
+
+        try:
+            while True:
+                next_token = asyncio.ensure_future(tokens.get())
+                done, _ = await asyncio.wait({next_token, task}, return_when=asyncio.FIRST_COMPLETED)
+                if next_token in done:
+                    yield "token", next_token.result()
+                    continue
+                next_token.cancel()
+                break
+
+            while not tokens.empty():
+                yield "token", tokens.get_nowait()
+            yield "result", task.result()
+        finally:
+            task.cancel()
+
     async def _generate_llm_squad_recommendation(
         self,
         players: List[Dict],
@@ -191,16 +1181,47 @@ class AIService:
         budget: float,
         formation: str,
         gameweeks: int,
-        user_preferences: Optional[Dict] = None
+        user_preferences: Optional[Dict] = None,
+        no_cache: bool = False,
+        on_token: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
         """Generate squad recommendation using OpenAI LLM with real data"""
 
         try:
+            # Same inputs over the same data: return the last result without calling the LLM
+            inputs_key = (budget, formation, gameweeks, _data_fingerprint(players))
+            if not no_cache:
+                previous = _squad_results.get(inputs_key)
+                if previous is not None:
+                    return {**previous, "generated_at": _now_iso()}
+
             # Prepare data for LLM
-            top_players_by_position = self._get_top_players_by_position(players)
+            # Keep the prompt small: a short list per position with only the fields the
+            # model uses, and a single strength figure per team
+            top_players_by_position = self._compact_players_for_llm(
+                self._get_top_players_by_position(players, limit=8)
+            )
             upcoming_fixtures_summary = self._summarize_fixtures(fixtures)
             team_strengths = self._summarize_team_strengths(teams)
 
+            # Reuse a recent squad for a near-identical request; the formation, horizon
+            # and budget window are checked exactly since embeddings blur numbers
+            signature = json.dumps({
+                "budget": budget,
+                "formation": formation,
+                "gw": gameweeks,
+                "top": top_players_by_position,
+                "fix": upcoming_fixtures_summary
+            }, sort_keys=True)
+            embedding = None if no_cache else await self._embed(signature)
+            if embedding is not None:
+                cached = _squad_cache.get(embedding, accept=lambda entry: (
+                    entry[0] == (formation, gameweeks)
+                    and budget - 2 <= entry[1]["total_cost"] <= budget
+                ))
+                if cached is not None:
+                    return {**cached[1], "generated_at": _now_iso()}
+
             # Create enhanced prompt for LLM with current FPL context
             prompt = f"""
 You are an expert Fantasy Premier League (FPL) analyst with access to current FPL news and trends. Generate a completely fresh, optimal squad for the next {gameweeks} gameweeks.
@@ -219,13 +1240,13 @@ CURRENT FPL CONTEXT (2025-26 Season):
 - Consider penalty takers and set piece specialists
 
 REAL PLAYER DATA (Top performers by position):
-{json.dumps(top_players_by_position, indent=2)}
+{_json_dumps(top_players_by_position, indent=False)}
 
 UPCOMING FIXTURES (Next {gameweeks} gameweeks):
-{json.dumps(upcoming_fixtures_summary, indent=2)}
+{_json_dumps(upcoming_fixtures_summary)}
 
 TEAM STRENGTHS & FORM:
-{json.dumps(team_strengths, indent=2)}
+{_json_dumps(team_strengths, indent=False)}
 
 STRATEGY GUIDELINES:
 1. **Budget Utilization**: Use £{budget-2}m to £{budget}m (don't leave money unused)
@@ -274,41 +1295,53 @@ IMPORTANT: Generate a completely fresh squad each time. Vary your selections bas
 """
 
             # Call OpenAI API with higher temperature for varied responses
-            response = await self.client.chat.completions.create(
-                model=self.model,
+            llm_response = await self._create_completion(
                 messages=[
                     {"role": "system", "content": "You are an expert FPL analyst with access to current news and trends. Generate unique, varied squad recommendations each time."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.7,  # Higher temperature for more varied recommendations
-                max_tokens=3000
+                max_tokens=3000,
+                no_cache=no_cache,
+                on_token=on_token,
+                response_format=_SQUAD_RESPONSE_FORMAT
             )
 
-            # Parse LLM response
-            llm_response = response.choices[0].message.content
-
             try:
-                # Extract JSON from markdown code blocks if present
-                import re
-                json_match = re.search(r'```json\s*(\{.*?\})\s*```', llm_response, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group(1)
-                else:
-                    # Try to find JSON object in response
-                    json_match = re.search(r'\{.*\}', llm_response, re.DOTALL)
+                # The response format makes the reply a bare JSON object; extraction from
+                # code blocks or surrounding prose is only a defensive fallback
+                try:
+                    recommendation = _json_loads(llm_response)
+                except json.JSONDecodeError:
+                    # Extract JSON from markdown code blocks if present
+                    json_match = _JSON_CODEBLOCK.search(llm_response)
                     if json_match:
-                        json_str = json_match.group(0)
+                        json_str = json_match.group(1)
                     else:
-                        json_str = llm_response
+                        # Try to find JSON object in response
+                        json_str = _extract_json_object(llm_response) or llm_response
 
-                # Parse the extracted JSON
-                recommendation = json.loads(json_str)
+                    # Parse the extracted JSON
+                    recommendation = _json_loads(json_str)
+
+                # The prompt asks for the team cap but the model can ignore it; build the
+                # squad locally rather than paying for another completion
+                picks_per_team = Counter(p.get("team") for p in recommendation.get("players", []))
+                if picks_per_team and max(picks_per_team.values()) > _MAX_PER_TEAM:
+                    logger.warning("LLM squad exceeds the per-team limit, using local squad builder")
+                    return await self._generate_enhanced_mock_squad(
+                        players, fixtures, teams, budget, formation, gameweeks
+                    )
 
                 # Add metadata
                 recommendation["recommendation_type"] = "squad_selection"
                 recommendation["data_source"] = "real_fpl_data"
                 recommendation["llm_model"] = self.model
-                recommendation["generated_at"] = datetime.now().isoformat()
+                recommendation["generated_at"] = _now_iso()
+
+                _squad_results.set(inputs_key, recommendation)
+                if embedding is not None and isinstance(recommendation.get("total_cost"), (int, float)):
+                    _squad_cache.add(embedding, ((formation, gameweeks), recommendation))
 
                 return recommendation
 
@@ -331,39 +1364,12 @@ IMPORTANT: Generate a completely fresh squad each time. Vary your selections bas
                 }
 
         except Exception as e:
-            print(f"Error calling OpenAI API: {e}")
+            logger.error(f"Error calling OpenAI API: {e}")
             # Fallback to enhanced mock
             return await self._generate_enhanced_mock_squad(
                 players, fixtures, teams, budget, formation, gameweeks
             )
 
-    def _get_top_players_by_position(self, players: List[Dict]) -> Dict[str, List[Dict]]:
-        """Get top players by position based on form and value"""
-        positions = {"GK": [], "DEF": [], "MID": [], "FWD": []}
-
-        for player in players:
-            pos = player.get("position", "")
-            if pos in positions:
-                # Calculate value score (points per price)
-                price = max(player.get("price", 4.0), 4.0)  # Minimum price
-                points = player.get("total_points", 0)
-                form = player.get("form", 0)
-
-                value_score = (points / price) + (form * 2)  # Weight form higher
-                player["value_score"] = value_score
-
-                positions[pos].append(player)
-
-        # Sort by value score and take top players
-        for pos in positions:
-            positions[pos] = sorted(
-                positions[pos],
-                key=lambda x: x.get("value_score", 0),
-                reverse=True
-            )[:20]  # Top 20 per position
-
-        return positions
-
     def _summarize_fixtures(self, fixtures: List[Dict]) -> List[Dict]:
         """Summarize upcoming fixtures for LLM"""
         summary = []
@@ -379,17 +1385,29 @@ IMPORTANT: Generate a completely fresh squad each time. Vary your selections bas
 
     def _summarize_team_strengths(self, teams: List[Dict]) -> List[Dict]:
         """Summarize team strengths for LLM"""
-        summary = []
-        for team in teams:
-            summary.append({
-                "name": team.get("name"),
-                "overall_strength": team.get("strength"),
-                "attack_home": team.get("strength_attack_home"),
-                "attack_away": team.get("strength_attack_away"),
-                "defence_home": team.get("strength_defence_home"),
-                "defence_away": team.get("strength_defence_away")
-            })
-        return summary
+        return [
+            {"name": team.get("name"), "overall_strength": team.get("strength")}
+            for team in teams
+        ]
+
+    def _compact_players_for_llm(self, players_by_position: Dict[str, List[Dict]]) -> Dict[str, List[Dict]]:
+        """Reduce each player to the fields the squad prompt needs"""
+        return {
+            pos: [
+                {
+                    "name": p.get("web_name"),
+                    "team": p.get("team"),
+                    "price": p.get("price"),
+                    "points": p.get("total_points"),
+                    "form": p.get("form"),
+                    "xg": p.get("expected_goals"),
+                    "xa": p.get("expected_assists"),
+                    "owned": p.get("selected_by_percent")
+                }
+                for p in pos_players
+            ]
+            for pos, pos_players in players_by_position.items()
+        }
 
     async def _generate_enhanced_mock_squad(
         self,
@@ -436,29 +1454,15 @@ IMPORTANT: Generate a completely fresh squad each time. Vary your selections bas
     def _build_budget_aware_squad(self, players: List[Dict], budget: float) -> List[Dict]:
         """Build a squad within budget constraints using value-based selection"""
 
-        # Group players by position and sort by value (points per price)
-        players_by_position = {"GK": [], "DEF": [], "MID": [], "FWD": []}
-
-        for player in players:
-            position = player.get("position", "Unknown")
-            if position in players_by_position:
-                # Calculate value score (points per price with form bonus)
-                price = max(player.get("price", 4.0), 0.1)  # Avoid division by zero
-                total_points = player.get("total_points", 0)
-                form = player.get("form", 0)
-
-                # Value score: prioritize points per price with form bonus
-                value_score = (total_points / price) + (form * 2)
-                player["value_score"] = value_score
-                players_by_position[position].append(player)
-
-        # Sort each position by value score
-        for position in players_by_position:
-            players_by_position[position].sort(key=lambda p: p.get("value_score", 0), reverse=True)
+        # Value score (points per price with form bonus) for every player, computed as
+        # array operations over the shared player table
+        table = get_player_table(players)
+        value_score = table.value_score
 
         # Build squad with budget constraints
         selected_players = []
         remaining_budget = budget
+        team_counts = np.zeros(len(table.team_names), dtype=np.int16)  # Picks per team code
 
         # Required squad structure: 2 GK, 5 DEF, 5 MID, 3 FWD
         # Adjust max prices based on budget to use more money
@@ -475,55 +1479,49 @@ IMPORTANT: Generate a completely fresh squad each time. Vary your selections bas
         ]
 
         for position, count, min_price, max_price in position_requirements:
-            position_players = players_by_position.get(position, [])
-            position_budget = remaining_budget * self._get_position_budget_ratio(position)
+            # Players in this position, best value first. The whole position is ranked
+            # because the cheapest-available fallback can reach past any top-k pool
+            ranked = table.top_indices(value_score, table.position_mask(position), len(table))
+            prices = table.price[ranked]
+            teams = table.team[ranked]
+            available = np.ones(len(ranked), dtype=bool)
+            position_budget = remaining_budget * _POSITION_BUDGET_RATIO.get(position, 0.15)
 
             for i in range(count):
-                if not position_players:
+                # Players not yet picked whose team is still under the cap
+                eligible = available & (team_counts[teams] < _MAX_PER_TEAM)
+                if not eligible.any():
                     break
 
                 # Find best affordable player
-                selected_player = None
-                for player in position_players:
-                    player_price = player.get("price", min_price)
-                    if player_price <= min(position_budget, remaining_budget, max_price):
-                        selected_player = player
-                        break
-
-                # If no affordable premium player, get cheapest available
-                if not selected_player:
-                    affordable_players = [p for p in position_players
-                                        if p.get("price", min_price) <= remaining_budget]
-                    if affordable_players:
-                        selected_player = min(affordable_players, key=lambda p: p.get("price", min_price))
-
-                if selected_player:
-                    # Format player data
-                    formatted_player = {
-                        "player_name": selected_player.get("name", f"Unknown {position}"),
-                        "team": selected_player.get("team", "Unknown"),
-                        "position": position,
-                        "price": selected_player.get("price", min_price),
-                        "predicted_points": min(selected_player.get("total_points", 0) * 0.3,
-                                              50 if position == "FWD" else 40 if position == "MID" else 30),
-                        "reasoning": self._get_player_reasoning(selected_player, position)
-                    }
-
-                    selected_players.append(formatted_player)
-                    remaining_budget -= selected_player.get("price", min_price)
-                    position_players.remove(selected_player)
+                affordable = eligible & (prices <= min(position_budget, remaining_budget, max_price))
+                if affordable.any():
+                    pick = int(np.argmax(affordable))
+                else:
+                    # If no affordable premium player, get cheapest available
+                    within_budget = eligible & (prices <= remaining_budget)
+                    if not within_budget.any():
+                        continue
+                    pick = int(np.argmin(np.where(within_budget, prices, np.inf)))
+
+                selected_player = table.players[ranked[pick]]
+
+                # Format player data
+                formatted_player = {
+                    "player_name": selected_player.get("name", f"Unknown {position}"),
+                    "team": selected_player.get("team", "Unknown"),
+                    "position": position,
+                    "price": selected_player.get("price", min_price),
+                    "predicted_points": min(selected_player.get("total_points", 0) * 0.3, _MAX_PREDICTED[position]),
+                    "reasoning": self._get_player_reasoning(selected_player, position)
+                }
 
-        return selected_players
+                selected_players.append(formatted_player)
+                remaining_budget -= selected_player.get("price", min_price)
+                available[pick] = False
+                team_counts[teams[pick]] += 1
 
-    def _get_position_budget_ratio(self, position: str) -> float:
-        """Get budget allocation ratio for each position"""
-        ratios = {
-            "GK": 0.10,   # 10% for goalkeepers
-            "DEF": 0.25,  # 25% for defenders
-            "MID": 0.45,  # 45% for midfielders (most important)
-            "FWD": 0.20   # 20% for forwards
-        }
-        return ratios.get(position, 0.15)
+        return selected_players
 
     def _get_player_reasoning(self, player: Dict, position: str) -> str:
         """Generate reasoning for player selection"""
@@ -737,41 +1735,14 @@ IMPORTANT: Generate a completely fresh squad each time. Vary your selections bas
 
         # Quick hardcoded recommendation for immediate response
         return {
-            "recommendation_type": "squad_selection",
+            **_FALLBACK_SQUAD,
             "formation": formation,
             "total_cost": min(budget, 100.0),
             "budget_used": min(budget, 100.0),  # Frontend expects this field
-            "predicted_points": 180.0,
-            "confidence": 0.75,
-            "players": [
-                {"player_name": "Haaland", "team": "Manchester City", "position": "FWD", "price": 15.0, "predicted_points": 12.5},
-                {"player_name": "Salah", "team": "Liverpool", "position": "MID", "price": 13.0, "predicted_points": 11.8},
-                {"player_name": "Palmer", "team": "Chelsea", "position": "MID", "price": 11.0, "predicted_points": 10.2},
-                {"player_name": "Saka", "team": "Arsenal", "position": "MID", "price": 10.0, "predicted_points": 9.5},
-                {"player_name": "Mbeumo", "team": "Brentford", "position": "MID", "price": 7.5, "predicted_points": 8.2},
-                {"player_name": "Cunha", "team": "Wolves", "position": "FWD", "price": 6.5, "predicted_points": 7.8},
-                {"player_name": "Gabriel", "team": "Arsenal", "position": "DEF", "price": 6.0, "predicted_points": 6.5},
-                {"player_name": "Gvardiol", "team": "Manchester City", "position": "DEF", "price": 5.5, "predicted_points": 6.2},
-                {"player_name": "Lewis", "team": "Newcastle", "position": "DEF", "price": 4.5, "predicted_points": 5.8},
-                {"player_name": "Raya", "team": "Arsenal", "position": "GKP", "price": 5.5, "predicted_points": 5.5},
-                {"player_name": "Fabianski", "team": "West Ham", "position": "GKP", "price": 4.0, "predicted_points": 4.2}
-            ],
-            "analysis": {
-                "data_source": "fallback_recommendation",
-                "confidence_score": 0.75,  # Frontend expects this field
-                "key_insights": [
-                    "Quick recommendation based on popular picks",
-                    "Balanced formation with premium attackers",
-                    "Good value options in midfield and defense"
-                ],
-                "captain_recommendation": "Haaland",
-                "risk_assessment": "Medium - safe popular picks"
-            },
             "ai_reasoning": f"Quick {formation} squad for {gameweeks} gameweeks. Premium attackers Haaland and Salah provide high ceiling, while Palmer and Saka offer consistent returns. Mbeumo is excellent value in midfield.",
-            "data_source": "fallback_data",
-            "generated_at": datetime.now().isoformat()
+            "generated_at": _now_iso()
         }
-    
+
     async def get_transfer_recommendations(
         self,
         current_squad: List[Dict],
@@ -782,9 +1753,8 @@ IMPORTANT: Generate a completely fresh squad each time. Vary your selections bas
         """Generate AI-powered transfer recommendations using real FPL data"""
 
         try:
-            # Fetch real data with timeout
-            players = await asyncio.wait_for(self._fetch_real_player_data(), timeout=5.0)
-            fixtures = await asyncio.wait_for(self._fetch_real_fixture_data(), timeout=3.0)
+            # Fetch real data concurrently, with one overall timeout
+            players, fixtures = await self._fetch_players_and_fixtures()
 
             # If no current squad provided, use fallback
             if not current_squad:
@@ -796,10 +1766,10 @@ IMPORTANT: Generate a completely fresh squad each time. Vary your selections bas
             )
 
         except asyncio.TimeoutError:
-            print("⚠️ Database query timeout for transfer recommendations, using fallback")
+            logger.warning("Database query timeout for transfer recommendations, using fallback")
             return await self._generate_fallback_transfer_recommendation(budget, free_transfers, gameweeks)
         except Exception as e:
-            print(f"Error in transfer recommendation: {e}")
+            logger.error(f"Error in transfer recommendation: {e}")
             return await self._generate_fallback_transfer_recommendation(budget, free_transfers, gameweeks)
 
     async def _analyze_transfer_opportunities(
@@ -814,15 +1784,23 @@ IMPORTANT: Generate a completely fresh squad each time. Vary your selections bas
         """Analyze current squad and find optimal transfer opportunities using real data"""
 
         # Step 1: Identify underperforming players in current squad
-        underperformers = self._identify_underperforming_players(current_squad, players)
+        # Only the worst few are used: one per free transfer, and at least one for the alternatives
+        underperformers = self._identify_underperforming_players(
+            current_squad, players, limit=max(free_transfers, 1)
+        )
+        if not underperformers:
+            return self._no_transfer_response(budget, gameweeks, len(players))
 
         # Step 2: Find better alternatives for each position
         transfer_opportunities = []
         total_cost_change = 0
+        total_expected_gain = 0
+        team_fixture_scores = self._build_team_fixture_scores(fixtures, gameweeks)
+        transfer_scores = get_player_table(players).transfer_score(team_fixture_scores)
 
         for underperformer in underperformers[:free_transfers]:  # Limit to available transfers
             alternatives = self._find_transfer_alternatives(
-                underperformer, players, fixtures, gameweeks
+                underperformer, players, transfer_scores
             )
 
             if alternatives:
@@ -831,6 +1809,7 @@ IMPORTANT: Generate a completely fresh squad each time. Vary your selections bas
 
                 # Check if we can afford this transfer
                 if total_cost_change + cost_change <= budget:
+                    expected_gain = self._calculate_expected_gain(underperformer, best_alternative, gameweeks)
                     transfer_opportunities.append({
                         "out": {
                             "player_name": underperformer.get("name", "Unknown"),
@@ -853,10 +1832,11 @@ IMPORTANT: Generate a completely fresh squad each time. Vary your selections bas
                         },
                         "reasoning": self._generate_transfer_reasoning(underperformer, best_alternative, fixtures),
                         "priority": len(transfer_opportunities) + 1,
-                        "expected_gain": self._calculate_expected_gain(underperformer, best_alternative, gameweeks),
+                        "expected_gain": expected_gain,
                         "cost_change": cost_change
                     })
                     total_cost_change += cost_change
+                    total_expected_gain += expected_gain
 
         # Step 3: Generate alternatives and summary
         alternatives = self._generate_transfer_alternatives(underperformers, players, budget, free_transfers)
@@ -867,7 +1847,7 @@ IMPORTANT: Generate a completely fresh squad each time. Vary your selections bas
             "budget_remaining": budget - total_cost_change,
             "transfers": transfer_opportunities,
             "analysis": {
-                "total_expected_gain": sum(t.get("expected_gain", 0) for t in transfer_opportunities),
+                "total_expected_gain": total_expected_gain,
                 "risk_assessment": self._assess_transfer_risk(transfer_opportunities),
                 "fixture_analysis": f"Analysis based on next {gameweeks} gameweeks",
                 "form_analysis": "Prioritized players with strong recent form and underlying stats",
@@ -878,105 +1858,123 @@ IMPORTANT: Generate a completely fresh squad each time. Vary your selections bas
             "ai_summary": self._generate_transfer_summary(transfer_opportunities, alternatives)
         }
 
-    def _identify_underperforming_players(self, current_squad: List[Dict], all_players: List[Dict]) -> List[Dict]:
-        """Identify players in current squad who are underperforming"""
-        underperformers = []
+    def _no_transfer_response(self, budget: float, gameweeks: int, players_analyzed: int) -> Dict[str, Any]:
+        """Transfer analysis result for a squad with no underperformers"""
+        return {
+            "recommendation_type": "transfers",
+            "transfers_suggested": 0,
+            "budget_remaining": budget,
+            "transfers": [],
+            "analysis": {
+                "total_expected_gain": 0,
+                "risk_assessment": "No transfers recommended",
+                "fixture_analysis": f"Analysis based on next {gameweeks} gameweeks",
+                "form_analysis": "Prioritized players with strong recent form and underlying stats",
+                "data_source": "real_fpl_data",
+                "players_analyzed": players_analyzed
+            },
+            "alternatives": [],
+            "ai_summary": "No immediate transfers recommended. Current squad performing adequately."
+        }
+
+    def _identify_underperforming_players(
+        self,
+        current_squad: List[Dict],
+        all_players: List[Dict],
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """Identify players in current squad who are underperforming, worst first
+
+        With ``limit`` only that many are returned, selected without sorting the rest.
+        """
+        table = get_player_table(all_players)
+        rows = []
 
         for squad_player in current_squad:
-            # Find full player data
-            player_data = None
-            for player in all_players:
-                if (player.get("name") == squad_player.get("player_name") or
-                    player.get("id") == squad_player.get("player_id")):
-                    player_data = player
-                    break
+            # Find full player data, by id and then by name
+            row = table.id_index.get(squad_player.get("player_id"))
+            if row is None:
+                row = table.name_index.get(squad_player.get("player_name"))
 
-            if player_data:
+            if row is not None:
                 # Calculate underperformance score
-                form = player_data.get("form", 0)
-                points_per_game = player_data.get("points_per_game", 0)
-                price = player_data.get("price", 0)
+                form = table.form[row]
+                points_per_game = table.points_per_game[row]
+                price = table.price[row]
 
                 # Poor form or low points per game relative to price
                 if form < 3.0 or (points_per_game < 4.0 and price > 6.0) or (points_per_game < 2.0):
-                    underperformers.append(player_data)
+                    rows.append(row)
 
-        # Sort by worst performers first (lowest form + points per game)
-        underperformers.sort(key=lambda p: p.get("form", 0) + p.get("points_per_game", 0))
-        return underperformers
+        # Worst performers first (lowest form + points per game); keys are computed
+        # in one pass so the sort only indexes a list
+        badness = (table.form[rows] + table.points_per_game[rows]).tolist()
+        if limit is not None:
+            order = heapq.nsmallest(limit, range(len(rows)), key=badness.__getitem__)
+        else:
+            order = sorted(range(len(rows)), key=badness.__getitem__)
+        return [all_players[rows[i]] for i in order]
 
     def _find_transfer_alternatives(
         self,
         underperformer: Dict,
         all_players: List[Dict],
-        fixtures: List[Dict],
-        gameweeks: int
+        transfer_scores: np.ndarray
     ) -> List[Dict]:
-        """Find better alternatives for an underperforming player"""
-        position = underperformer.get("position")
-        current_price = underperformer.get("price", 0)
-
+        """Find better alternatives for an underperforming player
+
+        ``transfer_scores`` holds the transfer score of every player in ``all_players``,
+        computed once per recommendation by PlayerTable.transfer_score.
+        """
+        table = get_player_table(all_players)
+
+        # Only consider same-position players that are significantly better
+        current_score = (underperformer.get("form", 0) * 2) + (underperformer.get("points_per_game", 0) * 3)
+        mask = (
+            table.position_mask(underperformer.get("position"))
+            & (table.names != underperformer.get("name"))
+            & (transfer_scores > current_score + 2)  # Minimum improvement threshold
+        )
+
+        # Top 5 alternatives, best transfer score first
         alternatives = []
-        for player in all_players:
-            if (player.get("position") == position and
-                player.get("name") != underperformer.get("name")):
-
-                # Calculate transfer score
-                form = player.get("form", 0)
-                points_per_game = player.get("points_per_game", 0)
-                price = player.get("price", 0)
-
-                # Fixture difficulty for next few gameweeks
-                fixture_score = self._calculate_fixture_score(player, fixtures, gameweeks)
-
-                # Overall transfer score
-                transfer_score = (form * 2) + (points_per_game * 3) + fixture_score - (price * 0.1)
-
-                # Only consider if significantly better
-                current_score = (underperformer.get("form", 0) * 2) + (underperformer.get("points_per_game", 0) * 3)
-                if transfer_score > current_score + 2:  # Minimum improvement threshold
-                    player["confidence"] = min(0.95, 0.6 + (transfer_score - current_score) * 0.05)
-                    player["transfer_score"] = transfer_score
-                    alternatives.append(player)
-
-        # Sort by transfer score (best first)
-        alternatives.sort(key=lambda p: p.get("transfer_score", 0), reverse=True)
-        return alternatives[:5]  # Top 5 alternatives
-
-    def _calculate_fixture_score(self, player: Dict, fixtures: List[Dict], gameweeks: int) -> float:
-        """Calculate fixture difficulty score for a player over next gameweeks"""
-        team_name = player.get("team")
-        fixture_score = 0
-        fixtures_found = 0
+        for index in table.top_indices(transfer_scores, mask, 5):
+            transfer_score = float(transfer_scores[index])
+            alternatives.append({
+                **all_players[index].to_dict(),
+                "confidence": min(0.95, 0.6 + (transfer_score - current_score) * 0.05),
+                "transfer_score": transfer_score
+            })
+        return alternatives
 
-        for fixture in fixtures:
-            if fixtures_found >= gameweeks:
-                break
+    def _build_team_fixture_scores(self, fixtures: List[Dict], gameweeks: int) -> Dict[str, float]:
+        """Average fixture score per team over its next gameweeks, in one pass over fixtures"""
+        totals: Dict[str, int] = {}
+        counts: Dict[str, int] = {}
 
-            if fixture.get("team_h") == team_name or fixture.get("team_a") == team_name:
-                is_home = fixture.get("team_h") == team_name
-                difficulty = fixture.get("team_h_difficulty") if is_home else fixture.get("team_a_difficulty")
+        for fixture in fixtures:
+            team_h = fixture.get("team_h")
+            team_a = fixture.get("team_a")
+            sides = [(team_h, fixture.get("team_h_difficulty"))]
+            if team_a != team_h:
+                sides.append((team_a, fixture.get("team_a_difficulty")))
 
+            for team, difficulty in sides:
                 # Lower difficulty = better fixture = higher score
-                if difficulty:
-                    fixture_score += (6 - difficulty)  # Convert 1-5 scale to 5-1 scale
-                    fixtures_found += 1
+                if difficulty and counts.get(team, 0) < gameweeks:
+                    totals[team] = totals.get(team, 0) + (6 - difficulty)  # Convert 1-5 scale to 5-1 scale
+                    counts[team] = counts.get(team, 0) + 1
 
-        return fixture_score / max(fixtures_found, 1)  # Average fixture score
+        return {team: total / counts[team] for team, total in totals.items()}  # Average fixture score
 
     def _calculate_predicted_points(self, player: Dict, gameweeks: int) -> float:
         """Calculate predicted points for a player over next gameweeks"""
-        points_per_game = player.get("points_per_game", 0)
-        form = player.get("form", 0)
-
-        # Weight recent form more heavily
-        adjusted_ppg = (points_per_game * 0.7) + (form * 0.3)
-        return round(adjusted_ppg * gameweeks, 1)
+        return _predicted_points(player.get("points_per_game", 0), player.get("form", 0), gameweeks)
 
     def _calculate_expected_gain(self, out_player: Dict, in_player: Dict, gameweeks: int) -> float:
         """Calculate expected points gain from transfer"""
-        out_predicted = self._calculate_predicted_points(out_player, gameweeks)
-        in_predicted = self._calculate_predicted_points(in_player, gameweeks)
+        out_predicted = _predicted_points(out_player.get("points_per_game", 0), out_player.get("form", 0), gameweeks)
+        in_predicted = _predicted_points(in_player.get("points_per_game", 0), in_player.get("form", 0), gameweeks)
         return round(in_predicted - out_predicted, 1)
 
     def _get_sell_reason(self, player: Dict, fixtures: List[Dict]) -> str:
@@ -993,11 +1991,11 @@ IMPORTANT: Generate a completely fresh squad each time. Vary your selections bas
 
     def _generate_transfer_reasoning(self, out_player: Dict, in_player: Dict, fixtures: List[Dict]) -> str:
         """Generate reasoning for a specific transfer"""
-        in_form = in_player.get("form", 0)
-        in_ppg = in_player.get("points_per_game", 0)
-        out_form = out_player.get("form", 0)
-
-        return f"{in_player.get('name')} has superior form ({in_form} vs {out_form}) and better underlying stats. Expected to outperform over next few gameweeks."
+        return _TRANSFER_REASONING.format_map({
+            "name": in_player.get("name"),
+            "in_form": in_player.get("form", 0),
+            "out_form": out_player.get("form", 0)
+        })
 
     def _assess_transfer_risk(self, transfers: List[Dict]) -> str:
         """Assess overall risk of transfer recommendations"""
@@ -1019,13 +2017,16 @@ IMPORTANT: Generate a completely fresh squad each time. Vary your selections bas
         if underperformers:
             # Conservative single transfer option
             best_underperformer = underperformers[0]
-            cheap_alternatives = [p for p in players
-                                if p.get("position") == best_underperformer.get("position")
-                                and p.get("price", 0) <= best_underperformer.get("price", 0) + budget
-                                and p.get("form", 0) > best_underperformer.get("form", 0)]
+            table = get_player_table(players)
+            cheap_alternatives = np.flatnonzero(
+                table.position_mask(best_underperformer.get("position"))
+                & (table.price <= best_underperformer.get("price", 0) + budget)
+                & (table.form > best_underperformer.get("form", 0))
+            )
 
-            if cheap_alternatives:
-                best_cheap = max(cheap_alternatives, key=lambda p: p.get("form", 0))
+            if cheap_alternatives.size:
+                # Best form, first in list order on ties
+                best_cheap = players[cheap_alternatives[np.argmax(table.form[cheap_alternatives])]]
                 alternatives.append({
                     "option": f"Single transfer: {best_underperformer.get('name')} → {best_cheap.get('name')}",
                     "reasoning": "Conservative approach, saves transfers for future",
@@ -1040,17 +2041,11 @@ IMPORTANT: Generate a completely fresh squad each time. Vary your selections bas
             return "No immediate transfers recommended. Current squad performing adequately."
 
         priority_transfer = transfers[0]
-        out_name = priority_transfer["out"]["player_name"]
-        in_name = priority_transfer["in"]["player_name"]
-
-        summary = f"Priority transfer is {out_name} to {in_name} - "
-        summary += f"form and fixture analysis strongly supports this move. "
-
-        if len(transfers) > 1:
-            summary += f"Secondary transfer also recommended for additional value. "
-
-        summary += "Consider timing based on price change predictions and injury news."
-        return summary
+        template = _TRANSFER_SUMMARY_MULTIPLE if len(transfers) > 1 else _TRANSFER_SUMMARY
+        return template.format_map({
+            "out_name": priority_transfer["out"]["player_name"],
+            "in_name": priority_transfer["in"]["player_name"]
+        })
 
     async def _generate_fallback_transfer_recommendation(
         self,
@@ -1061,51 +2056,12 @@ IMPORTANT: Generate a completely fresh squad each time. Vary your selections bas
         """Generate fallback transfer recommendation when no squad provided or data unavailable"""
 
         return {
-            "recommendation_type": "transfers",
-            "transfers_suggested": 1,
+            **_FALLBACK_TRANSFERS,
             "budget_remaining": budget - 2.5,
-            "transfers": [
-                {
-                    "out": {
-                        "player_name": "Rashford",
-                        "team": "Manchester Utd",
-                        "position": "MID",
-                        "price": 8.5,
-                        "recent_form": 2.8,
-                        "total_points": 45,
-                        "reason_to_sell": "Poor recent form and difficult fixtures"
-                    },
-                    "in": {
-                        "player_name": "Palmer",
-                        "team": "Chelsea",
-                        "position": "MID",
-                        "price": 11.0,
-                        "predicted_points": 25,
-                        "confidence": 0.88,
-                        "form": 8.2,
-                        "total_points": 156
-                    },
-                    "reasoning": "Palmer has excellent underlying stats, penalty duties, and favorable fixtures. Strong form suggests continued returns.",
-                    "priority": 1,
-                    "expected_gain": 8.5,
-                    "cost_change": 2.5
-                }
-            ],
             "analysis": {
-                "total_expected_gain": 8.5,
-                "risk_assessment": "Medium - Premium price but strong underlying data",
-                "fixture_analysis": f"Analysis based on next {gameweeks} gameweeks",
-                "form_analysis": "Prioritized players with strong recent form",
-                "data_source": "fallback_recommendation"
-            },
-            "alternatives": [
-                {
-                    "option": "Budget option: Rashford → Mbeumo",
-                    "reasoning": "Lower cost alternative with good recent form",
-                    "expected_gain": 6.2
-                }
-            ],
-            "ai_summary": "Palmer represents excellent value despite premium price. Strong form, penalty duties, and favorable fixtures make this a priority transfer."
+                **_FALLBACK_TRANSFERS["analysis"],
+                "fixture_analysis": f"Analysis based on next {gameweeks} gameweeks"
+            }
         }
 
     async def get_fpl_transfer_recommendations(
@@ -1121,8 +2077,7 @@ IMPORTANT: Generate a completely fresh squad each time. Vary your selections bas
                 return await self._generate_pre_season_squad_recommendation(user_team_data, gameweeks)
 
             # Fetch real data for analysis
-            players = await asyncio.wait_for(self._fetch_real_player_data(), timeout=5.0)
-            fixtures = await asyncio.wait_for(self._fetch_real_fixture_data(), timeout=3.0)
+            players, fixtures = await self._fetch_players_and_fixtures()
 
             if self.use_llm and self.client:
                 return await self._generate_llm_fpl_transfer_recommendations(
@@ -1135,10 +2090,10 @@ IMPORTANT: Generate a completely fresh squad each time. Vary your selections bas
                 )
 
         except asyncio.TimeoutError:
-            print("⚠️ Database query timeout for FPL transfer recommendations")
+            logger.warning("Database query timeout for FPL transfer recommendations")
             return await self._generate_fallback_fpl_transfer_recommendation(user_team_data, gameweeks)
         except Exception as e:
-            print(f"Error in FPL transfer recommendation: {e}")
+            logger.error(f"Error in FPL transfer recommendation: {e}")
             return await self._generate_fallback_fpl_transfer_recommendation(user_team_data, gameweeks)
 
     async def _generate_llm_fpl_transfer_recommendations(
@@ -1157,16 +2112,21 @@ IMPORTANT: Generate a completely fresh squad each time. Vary your selections bas
         bank = user_team_data.get('bank', 0)
         free_transfers = user_team_data.get('free_transfers', 1)
 
+        # Identical squads get identical advice, so reuse a parsed earlier reply
+        cache_key = _transfer_cache_key(squad, bank, free_transfers, gameweeks, self.model)
+        cached = await redis_get(cache_key)
+        if cached is not None:
+            return self._add_llm_transfer_metadata(cached, user_info, bank, players)
+
         # Analyze squad performance
         squad_analysis = self._analyze_squad_performance(squad, players)
 
         # Get upcoming fixtures for squad players
         squad_fixtures = self._get_squad_fixtures(squad, fixtures, gameweeks)
 
-        # Prepare LLM prompt
+        # Per-user part of the prompt; everything shared between users is in the
+        # system message so the provider can reuse the cached prefix
         prompt = f"""
-You are an expert Fantasy Premier League analyst. Analyze this user's team and provide intelligent transfer recommendations.
-
 USER TEAM INFORMATION:
 - Manager: {user_info.get('name', 'Unknown')}
 - Team Name: {user_info.get('team_name', 'Unknown')}
@@ -1186,77 +2146,31 @@ UPCOMING FIXTURES (Next {gameweeks} gameweeks):
 
 RECENT TRANSFER HISTORY:
 {self._format_transfers_for_llm(recent_transfers)}
-
-AVAILABLE PLAYERS (Top performers by position):
-{self._format_top_players_for_llm(players)}
-
-Please provide transfer recommendations considering:
-1. Underperforming players in current squad
-2. Better alternatives available within budget
-3. Upcoming fixture difficulty
-4. Recent transfer patterns and strategy
-5. Value for money and points potential
-
-Respond in JSON format with:
-{{
-    "recommendation_type": "fpl_transfers",
-    "priority_transfers": [
-        {{
-            "out": {{"player_name": "...", "reason": "..."}},
-            "in": {{"player_name": "...", "reason": "..."}},
-            "priority": 1,
-            "cost_change": 0.5,
-            "expected_gain": 8.2,
-            "confidence": 0.85
-        }}
-    ],
-    "alternative_strategies": [
-        {{
-            "strategy": "...",
-            "reasoning": "...",
-            "transfers": [...]
-        }}
-    ],
-    "squad_analysis": {{
-        "strengths": ["...", "..."],
-        "weaknesses": ["...", "..."],
-        "overall_rating": 8.5
-    }},
-    "ai_summary": "Detailed analysis and recommendations..."
-}}
 """
 
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
+            llm_response = await self._create_completion(
                 messages=[
-                    {"role": "system", "content": "You are an expert Fantasy Premier League analyst providing data-driven transfer recommendations."},
+                    {"role": "system", "content": self._transfer_system_prompt(players)},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.3,
-                max_tokens=2000
+                max_tokens=2000,
+                response_format=_JSON_OBJECT_FORMAT
             )
 
-            # Parse LLM response
-            llm_response = response.choices[0].message.content
-
-            # Try to extract JSON from response
-            import re
-            json_match = re.search(r'\{.*\}', llm_response, re.DOTALL)
-            if json_match:
-                recommendation_data = json.loads(json_match.group())
-
-                # Add metadata
-                recommendation_data.update({
-                    "user_info": user_info,
-                    "bank_remaining": bank,
-                    "free_transfers_used": len(recommendation_data.get("priority_transfers", [])),
-                    "data_source": "llm_analysis",
-                    "players_analyzed": len(players),
-                    "generated_at": datetime.now().isoformat()
-                })
+            # JSON mode makes the reply a bare object; extraction is a defensive fallback
+            recommendation_data = None
+            try:
+                recommendation_data = _json_loads(llm_response)
+            except json.JSONDecodeError:
+                json_str = _extract_json_object(llm_response)
+                if json_str:
+                    recommendation_data = _json_loads(json_str)
 
-                return recommendation_data
+            if recommendation_data is not None:
+                await redis_set(cache_key, recommendation_data, settings.TRANSFER_LLM_CACHE_TTL)
+                return self._add_llm_transfer_metadata(recommendation_data, user_info, bank, players)
             else:
                 # Fallback if JSON parsing fails
                 return await self._generate_enhanced_fpl_transfer_recommendations(
@@ -1264,80 +2178,95 @@ Respond in JSON format with:
                 )
 
         except Exception as e:
-            print(f"LLM analysis failed: {e}")
+            logger.error(f"LLM analysis failed: {e}")
             return await self._generate_enhanced_fpl_transfer_recommendations(
                 user_team_data, players, fixtures, gameweeks
             )
 
-    def _analyze_squad_performance(self, squad: List[Dict], all_players: List[Dict]) -> str:
-        """Analyze current squad performance"""
-        analysis = []
-        total_points = sum(p.get('total_points', 0) for p in squad)
-        avg_form = sum(p.get('form', 0) for p in squad) / len(squad) if squad else 0
-
-        analysis.append(f"Squad Total Points: {total_points}")
-        analysis.append(f"Average Form: {avg_form:.1f}")
-
-        # Find underperformers
-        underperformers = [p for p in squad if p.get('form', 0) < 3.0 or
-                          (p.get('total_points', 0) / max(p.get('price', 1), 1) < 15)]
+    def _transfer_system_prompt(self, players: List[Dict]) -> str:
+        """System message for LLM transfers, rebuilt only when the player list changes"""
+        if _transfer_system["players"] is not players:
+            _transfer_system["prompt"] = _TRANSFER_SYSTEM_PROMPT.replace(
+                "{top_players}", self._format_top_players_for_llm(players)
+            )
+            _transfer_system["players"] = players
+        return _transfer_system["prompt"]
 
-        if underperformers:
-            analysis.append(f"Underperformers: {', '.join(p['player_name'] for p in underperformers)}")
+    def _add_llm_transfer_metadata(
+        self,
+        recommendation_data: Dict[str, Any],
+        user_info: Dict[str, Any],
+        bank: float,
+        players: List[Dict]
+    ) -> Dict[str, Any]:
+        """Attach per-request metadata to parsed LLM transfer advice"""
+        recommendation_data["bank_remaining"] = bank
+        recommendation_data["free_transfers_used"] = len(recommendation_data.get("priority_transfers", []))
+        return _envelope(recommendation_data, user_info, "llm_analysis", len(players))
 
-        return "\n".join(analysis)
+    def _analyze_squad_performance(self, squad: List[Dict], all_players: List[Dict]) -> str:
+        """Analyze current squad performance; identical squads reuse the cached text"""
+        return _squad_performance_text(tuple(
+            (p.get('player_name', 'Unknown'), p.get('total_points', 0), p.get('form', 0), p.get('price', 1))
+            for p in squad
+        ))
 
     def _get_squad_fixtures(self, squad: List[Dict], fixtures: List[Dict], gameweeks: int) -> str:
         """Get upcoming fixtures for squad players"""
-        squad_teams = {p.get('team') for p in squad}
-        relevant_fixtures = []
+        squad_teams = frozenset(p.get('team') for p in squad)
+        key = (squad_teams, gameweeks)
+        cached = _squad_fixture_text.get(key)
+        if cached is not None and cached[0] is fixtures:
+            return cached[1]
+
+        # Positions of the squad teams' fixtures, in fixture order, from the team index
+        index = _team_fixture_index(fixtures)
+        limit = gameweeks * 10  # Approximate fixture limit
+        positions = set()
+        for team in squad_teams:
+            team_positions = index.get(team, [])
+            positions.update(team_positions[:bisect.bisect_left(team_positions, limit)])
 
-        for fixture in fixtures[:gameweeks * 10]:  # Approximate fixture limit
+        relevant_fixtures = []
+        for position in heapq.nsmallest(15, positions):  # Limit output
+            fixture = fixtures[position]
             home_team = fixture.get('team_h_name', '')
             away_team = fixture.get('team_a_name', '')
+            difficulty_h = fixture.get('team_h_difficulty', 3)
+            difficulty_a = fixture.get('team_a_difficulty', 3)
+            relevant_fixtures.append(f"{home_team} vs {away_team} (Difficulty: {difficulty_h}-{difficulty_a})")
 
-            if home_team in squad_teams or away_team in squad_teams:
-                difficulty_h = fixture.get('team_h_difficulty', 3)
-                difficulty_a = fixture.get('team_a_difficulty', 3)
-                relevant_fixtures.append(f"{home_team} vs {away_team} (Difficulty: {difficulty_h}-{difficulty_a})")
-
-        return "\n".join(relevant_fixtures[:15])  # Limit output
+        text = "\n".join(relevant_fixtures)
+        _squad_fixture_text.set(key, (fixtures, text))
+        return text
 
     def _format_squad_for_llm(self, squad: List[Dict]) -> str:
         """Format squad data for LLM"""
-        formatted = []
-        for player in squad:
-            formatted.append(
-                f"- {player.get('player_name', 'Unknown')} ({player.get('position', 'Unknown')}) "
-                f"- {player.get('team', 'Unknown')} - £{player.get('price', 0)}m "
-                f"- {player.get('total_points', 0)} pts - Form: {player.get('form', 0)}"
-            )
-        return "\n".join(formatted)
+        return "\n".join(
+            f"- {player.get('player_name', 'Unknown')} ({player.get('position', 'Unknown')}) "
+            f"- {player.get('team', 'Unknown')} - £{player.get('price', 0)}m "
+            f"- {player.get('total_points', 0)} pts - Form: {player.get('form', 0)}"
+            for player in squad
+        )
 
     def _format_transfers_for_llm(self, transfers: List[Dict]) -> str:
         """Format recent transfers for LLM"""
         if not transfers:
             return "No recent transfers"
 
-        formatted = []
-        for transfer in transfers[-3:]:  # Last 3 transfers
-            formatted.append(f"GW{transfer.get('event', '?')}: {transfer.get('element_in_name', '?')} in, {transfer.get('element_out_name', '?')} out")
-
-        return "\n".join(formatted)
+        return "\n".join(
+            f"GW{transfer.get('event', '?')}: {transfer.get('element_in_name', '?')} in, {transfer.get('element_out_name', '?')} out"
+            for transfer in transfers[-3:]  # Last 3 transfers
+        )
 
     def _format_top_players_for_llm(self, players: List[Dict]) -> str:
         """Format top players by position for LLM"""
-        positions = {'GK': [], 'DEF': [], 'MID': [], 'FWD': []}
-
-        for player in players:
-            pos = player.get('position', 'Unknown')
-            if pos in positions:
-                positions[pos].append(player)
+        table = get_player_table(players)
 
         formatted = []
-        for pos, pos_players in positions.items():
-            # Sort by points per game and take top 3
-            top_players = sorted(pos_players, key=lambda p: p.get('points_per_game', 0), reverse=True)[:3]
+        for pos in POSITION_CODES:
+            # Top 3 by points per game, ranked over the table columns
+            top_players = [players[i] for i in table.top_indices(table.points_per_game, table.position_mask(pos), 3)]
             formatted.append(f"\n{pos}:")
             for player in top_players:
                 formatted.append(
@@ -1372,22 +2301,22 @@ Respond in JSON format with:
 
         # Find better alternatives
         priority_transfers = []
+        by_position = get_player_table(players).by_position
         for underperformer in underperformers[:free_transfers]:
             position = underperformer.get('position')
             current_price = underperformer.get('price', 0)
             max_price = current_price + bank
 
-            # Find better players in same position
-            alternatives = [
-                p for p in players
-                if p.get('position') == position
-                and p.get('price', 0) <= max_price
-                and p.get('total_points', 0) > underperformer.get('total_points', 0)
-            ]
-
-            if alternatives:
-                best_alternative = max(alternatives, key=lambda p: p.get('points_per_game', 0))
+            # Find the best-PPG player in the same position in one pass
+            points_threshold = underperformer.get('total_points', 0)
+            best_alternative, best_ppg = None, None
+            for p in by_position.get(position, ()):
+                if p.price <= max_price and p.total_points > points_threshold:
+                    ppg = p.points_per_game
+                    if best_alternative is None or ppg > best_ppg:
+                        best_alternative, best_ppg = p, ppg
 
+            if best_alternative is not None:
                 priority_transfers.append({
                     "out": {
                         "player_name": underperformer.get('player_name', 'Unknown'),
@@ -1404,7 +2333,7 @@ Respond in JSON format with:
                     "confidence": 0.75
                 })
 
-        return {
+        return _envelope({
             "recommendation_type": "fpl_transfers",
             "priority_transfers": priority_transfers,
             "alternative_strategies": [
@@ -1419,14 +2348,10 @@ Respond in JSON format with:
                 "weaknesses": [f"{len(underperformers)} underperforming players"] if underperformers else ["No major weaknesses"],
                 "overall_rating": 8.0 - len(underperformers) * 0.5
             },
-            "user_info": user_team_data.get('user_info', {}),
             "bank_remaining": bank,
             "free_transfers_used": len(priority_transfers),
-            "data_source": "enhanced_analysis",
-            "players_analyzed": len(players),
-            "ai_summary": f"Analysis of your FPL team suggests {len(priority_transfers)} priority transfers. Focus on replacing underperforming players with better alternatives within budget.",
-            "generated_at": datetime.now().isoformat()
-        }
+            "ai_summary": f"Analysis of your FPL team suggests {len(priority_transfers)} priority transfers. Focus on replacing underperforming players with better alternatives within budget."
+        }, user_team_data.get('user_info', {}), "enhanced_analysis", len(players))
 
     async def _generate_fallback_fpl_transfer_recommendation(
         self,
@@ -1436,41 +2361,10 @@ Respond in JSON format with:
         """Generate fallback recommendation when data is unavailable"""
 
         return {
-            "recommendation_type": "fpl_transfers",
-            "priority_transfers": [
-                {
-                    "out": {
-                        "player_name": "Underperforming Player",
-                        "reason": "Poor recent form and fixtures"
-                    },
-                    "in": {
-                        "player_name": "Palmer",
-                        "reason": "Excellent form and favorable fixtures"
-                    },
-                    "priority": 1,
-                    "cost_change": 2.5,
-                    "expected_gain": 8.5,
-                    "confidence": 0.80
-                }
-            ],
-            "alternative_strategies": [
-                {
-                    "strategy": "Wait and see",
-                    "reasoning": "Monitor player performances for another gameweek",
-                    "transfers": []
-                }
-            ],
-            "squad_analysis": {
-                "strengths": ["Unable to analyze - data unavailable"],
-                "weaknesses": ["Unable to analyze - data unavailable"],
-                "overall_rating": 7.0
-            },
+            **_FALLBACK_FPL_TRANSFERS,
             "user_info": user_team_data.get('user_info', {}),
             "bank_remaining": user_team_data.get('bank', 0),
-            "free_transfers_used": 1,
-            "data_source": "fallback_recommendation",
-            "ai_summary": "Unable to fetch current data. Consider popular transfers like bringing in Palmer for consistent returns.",
-            "generated_at": datetime.now().isoformat()
+            "generated_at": _now_iso()
         }
 
     async def _generate_pre_season_squad_recommendation(
@@ -1484,8 +2378,7 @@ Respond in JSON format with:
 
         try:
             # Fetch real data for analysis
-            players = await asyncio.wait_for(self._fetch_real_player_data(), timeout=5.0)
-            fixtures = await asyncio.wait_for(self._fetch_real_fixture_data(), timeout=3.0)
+            players, fixtures = await self._fetch_players_and_fixtures()
 
             if self.use_llm and self.client:
                 return await self._generate_llm_pre_season_recommendation(
@@ -1497,7 +2390,7 @@ Respond in JSON format with:
                 )
 
         except Exception as e:
-            print(f"Error in pre-season recommendation: {e}")
+            logger.error(f"Error in pre-season recommendation: {e}")
             return await self._generate_fallback_pre_season_recommendation(user_info, gameweeks)
 
     async def _generate_llm_pre_season_recommendation(
@@ -1575,8 +2468,7 @@ Respond in JSON format with:
 """
 
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
+            llm_response = await self._create_completion(
                 messages=[
                     {"role": "system", "content": "You are an expert Fantasy Premier League analyst providing comprehensive squad building advice."},
                     {"role": "user", "content": prompt}
@@ -1585,24 +2477,13 @@ Respond in JSON format with:
                 max_tokens=2500
             )
 
-            # Parse LLM response
-            llm_response = response.choices[0].message.content
-
             # Try to extract JSON from response
-            import re
-            json_match = re.search(r'\{.*\}', llm_response, re.DOTALL)
-            if json_match:
-                recommendation_data = json.loads(json_match.group())
+            json_str = _extract_json_object(llm_response)
+            if json_str:
+                recommendation_data = _json_loads(json_str)
 
                 # Add metadata
-                recommendation_data.update({
-                    "user_info": user_info,
-                    "data_source": "llm_analysis",
-                    "players_analyzed": len(players),
-                    "generated_at": datetime.now().isoformat()
-                })
-
-                return recommendation_data
+                return _envelope(recommendation_data, user_info, "llm_analysis", len(players))
             else:
                 # Fallback if JSON parsing fails
                 return await self._generate_enhanced_pre_season_recommendation(
@@ -1610,7 +2491,7 @@ Respond in JSON format with:
                 )
 
         except Exception as e:
-            print(f"LLM pre-season analysis failed: {e}")
+            logger.error(f"LLM pre-season analysis failed: {e}")
             return await self._generate_enhanced_pre_season_recommendation(
                 user_info, players, fixtures, gameweeks
             )
@@ -1625,13 +2506,13 @@ Respond in JSON format with:
         """Generate enhanced pre-season recommendations without LLM"""
 
         # Build a balanced squad using real data
-        squad = self._build_optimal_squad(players, 100.0)
+        squad, total_cost = self._build_optimal_squad(players, 100.0)
 
-        return {
+        return _envelope({
             "recommendation_type": "pre_season_squad",
             "squad_recommendation": {
                 "formation": "3-5-2",
-                "total_cost": sum(p.get('price', 0) for p in squad),
+                "total_cost": total_cost,
                 "players": squad
             },
             "key_strategies": [
@@ -1647,87 +2528,82 @@ Respond in JSON format with:
                     "reasoning": "Assess early season form before making changes"
                 }
             ],
-            "user_info": user_info,
-            "data_source": "enhanced_analysis",
-            "players_analyzed": len(players),
-            "ai_summary": f"Welcome to FPL 2025-26, {user_info.get('name', 'Manager')}! This squad balances premium picks with value options. Focus on strong opening fixtures and proven performers.",
-            "generated_at": datetime.now().isoformat()
-        }
+            "ai_summary": f"Welcome to FPL 2025-26, {user_info.get('name', 'Manager')}! This squad balances premium picks with value options. Focus on strong opening fixtures and proven performers."
+        }, user_info, "enhanced_analysis", len(players))
 
-    def _get_top_players_by_position(self, players: List[Dict]) -> Dict[str, List[Dict]]:
+    def _get_top_players_by_position(self, players: List[Dict], limit: int = 10) -> Dict[str, List[Dict]]:
         """Get top players by position for analysis"""
-        positions = {'GK': [], 'DEF': [], 'MID': [], 'FWD': []}
-
-        for player in players:
-            pos = player.get('position', 'Unknown')
-            if pos in positions:
-                positions[pos].append(player)
-
-        # Sort by total points and take top players
-        for pos in positions:
-            positions[pos] = sorted(positions[pos], key=lambda p: p.get('total_points', 0), reverse=True)[:10]
+        table = get_player_table(players)
 
-        return positions
+        # Rank each position by total points over the table columns and take top players
+        return {
+            pos: [players[i] for i in table.top_indices(table.total_points, table.position_mask(pos), limit)]
+            for pos in POSITION_CODES
+        }
 
     def _analyze_opening_fixtures(self, fixtures: List[Dict], gameweeks: int) -> str:
         """Analyze opening fixtures for all teams"""
-        team_fixtures = {}
+        team_fixtures = defaultdict(list)
+        # Only the first 10 teams seen are shown, with up to 3 fixtures each, so stop
+        # scanning once all of them have 3
+        shown_teams = set()
+        complete = 0
 
-        for fixture in fixtures[:gameweeks * 10]:  # Approximate
+        for fixture in islice(fixtures, gameweeks * 10):  # Approximate
             home_team = fixture.get('team_h_name', '')
             away_team = fixture.get('team_a_name', '')
 
-            if home_team not in team_fixtures:
-                team_fixtures[home_team] = []
-            if away_team not in team_fixtures:
-                team_fixtures[away_team] = []
+            for team, entry in ((home_team, f"vs {away_team} (H)"), (away_team, f"vs {home_team} (A)")):
+                listed = team_fixtures[team]
+                listed.append(entry)
+                if len(listed) == 1 and len(team_fixtures) <= 10:
+                    shown_teams.add(team)
+                if len(listed) == 3 and team in shown_teams:
+                    complete += 1
 
-            team_fixtures[home_team].append(f"vs {away_team} (H)")
-            team_fixtures[away_team].append(f"vs {home_team} (A)")
-
-        # Format for display
-        analysis = []
-        for team, fixtures_list in list(team_fixtures.items())[:10]:  # Top 10 teams
-            analysis.append(f"{team}: {', '.join(fixtures_list[:3])}")
+            if complete == 10:
+                break
 
-        return "\n".join(analysis)
+        # Format for display, top 10 teams
+        return "\n".join(
+            f"{team}: {', '.join(fixtures_list[:3])}"
+            for team, fixtures_list in islice(team_fixtures.items(), 10)
+        )
 
-    def _build_optimal_squad(self, players: List[Dict], budget: float) -> List[Dict]:
-        """Build an optimal squad within budget"""
+    def _build_optimal_squad(self, players: List[Dict], budget: float) -> Tuple[List[Dict], float]:
+        """Build an optimal squad within budget, returning the squad and its total cost"""
         squad = []
         remaining_budget = budget
-
-        # Get players by position
-        by_position = {'GK': [], 'DEF': [], 'MID': [], 'FWD': []}
-        for player in players:
-            pos = player.get('position', 'Unknown')
-            if pos in by_position:
-                by_position[pos].append(player)
-
-        # Sort by value (points per price)
-        for pos in by_position:
-            by_position[pos].sort(key=lambda p: p.get('total_points', 0) / max(p.get('price', 1), 1), reverse=True)
-
-        # Select players by position
-        selections = [
-            ('GK', 2), ('DEF', 5), ('MID', 5), ('FWD', 3)
-        ]
-
-        for pos, count in selections:
+        total_cost = 0
+
+        # Value (points per price) for every player, computed once rather than per comparison
+        table = get_player_table(players)
+        value = table.total_points / np.maximum(table.price, 1)
+
+        # Select players by position, each position's rows taken from the cached mask and
+        # ordered by value (ties keep list order)
+        for pos, count in _SQUAD_SELECTIONS:
+            ranked = table.top_indices(value, table.position_mask(pos), len(table))
+            candidates = [players[i] for i in ranked]
+            starters = _STARTER_COUNT[pos]
+            cursor = 0  # Next best-value candidate, instead of shifting the list with pop(0)
             for i in range(count):
-                if by_position[pos] and remaining_budget >= by_position[pos][0].get('price', 0):
-                    player = by_position[pos].pop(0)
+                if cursor < len(candidates) and remaining_budget >= candidates[cursor].get('price', 0):
+                    player = candidates[cursor]
+                    cursor += 1
+                    price = player.get('price', 0)
                     squad.append({
                         "player_name": player.get('name', 'Unknown'),
                         "position": pos,
                         "team": player.get('team', 'Unknown'),
-                        "price": player.get('price', 0),
+                        "price": price,
                         "reasoning": f"Top value pick in {pos} position",
-                        "starter": i < (2 if pos == 'GK' else 3 if pos == 'DEF' else 5 if pos == 'MID' else 2)
+                        "starter": i < starters
                     })
-                    remaining_budget -= player.get('price', 0)
+                    remaining_budget -= price
+                    total_cost += price
 
-        return squad
+        return squad, total_cost
 
     async def _generate_fallback_pre_season_recommendation(
         self,
@@ -1737,39 +2613,10 @@ Respond in JSON format with:
         """Generate fallback pre-season recommendation"""
 
         return {
-            "recommendation_type": "pre_season_squad",
-            "squad_recommendation": {
-                "formation": "3-5-2",
-                "total_cost": 100.0,
-                "players": [
-                    {"player_name": "Haaland", "position": "FWD", "team": "Manchester City", "price": 15.0, "reasoning": "Premium striker with highest ceiling", "starter": True},
-                    {"player_name": "Salah", "position": "MID", "team": "Liverpool", "price": 13.0, "reasoning": "Consistent performer with penalty duties", "starter": True},
-                    {"player_name": "Palmer", "position": "MID", "team": "Chelsea", "price": 11.0, "reasoning": "Excellent value with penalty duties", "starter": True},
-                    {"player_name": "Saka", "position": "MID", "team": "Arsenal", "price": 10.0, "reasoning": "Reliable returns from top team", "starter": True},
-                    {"player_name": "Mbeumo", "position": "MID", "team": "Brentford", "price": 7.5, "reasoning": "Great value midfielder", "starter": True},
-                    {"player_name": "Cunha", "position": "FWD", "team": "Wolves", "price": 6.5, "reasoning": "Value forward option", "starter": True},
-                    {"player_name": "Gabriel", "position": "DEF", "team": "Arsenal", "price": 6.0, "reasoning": "Attacking defender from top team", "starter": True},
-                    {"player_name": "Gvardiol", "position": "DEF", "team": "Manchester City", "price": 5.5, "reasoning": "Attacking threat from fullback", "starter": True},
-                    {"player_name": "Lewis", "position": "DEF", "team": "Newcastle", "price": 4.5, "reasoning": "Budget defender with potential", "starter": True}
-                ]
-            },
-            "key_strategies": [
-                "Premium attackers for high ceiling",
-                "Value picks in midfield and defense",
-                "Focus on penalty takers",
-                "Target players with good opening fixtures"
-            ],
-            "transfer_targets": [
-                {
-                    "gameweek": 3,
-                    "target": "Monitor early season form",
-                    "reasoning": "Assess performances before making changes"
-                }
-            ],
+            **_FALLBACK_PRE_SEASON,
             "user_info": user_info,
-            "data_source": "fallback_recommendation",
             "ai_summary": f"Welcome to FPL 2025-26, {user_info.get('name', 'Manager')}! This template squad provides a strong foundation with premium attackers and value picks.",
-            "generated_at": datetime.now().isoformat()
+            "generated_at": _now_iso()
         }
 
     async def get_captain_recommendations(
@@ -1780,9 +2627,8 @@ Respond in JSON format with:
         """Generate AI-powered captaincy recommendations using real FPL data and LLM analysis"""
 
         try:
-            # Fetch real data with timeout
-            players = await asyncio.wait_for(self._fetch_real_player_data(), timeout=5.0)
-            fixtures = await asyncio.wait_for(self._fetch_real_fixture_data(), timeout=3.0)
+            # Fetch real data concurrently, with one overall timeout
+            players, fixtures = await self._fetch_players_and_fixtures()
 
             # Use LLM for dynamic captain recommendations if available
             if self.use_llm and self.client:
@@ -1795,10 +2641,10 @@ Respond in JSON format with:
                     players, fixtures, squad, gameweek
                 )
         except asyncio.TimeoutError:
-            print("⚠️ Database query timeout for captain recommendations, using fallback")
+            logger.warning("Database query timeout for captain recommendations, using fallback")
             return await self._generate_fallback_captain_recommendation(gameweek)
         except Exception as e:
-            print(f"Error in captain recommendation: {e}")
+            logger.error(f"Error in captain recommendation: {e}")
             return await self._generate_fallback_captain_recommendation(gameweek)
 
     async def _generate_llm_captain_recommendation(
@@ -1826,10 +2672,10 @@ CURRENT FPL CONTEXT (2025-26 Season):
 - Look for favorable fixtures and opponent weaknesses
 
 TOP CAPTAIN CANDIDATES (Real FPL Data):
-{json.dumps(top_captains, indent=2)}
+{_json_dumps(top_captains)}
 
 FIXTURE ANALYSIS (Next gameweek):
-{json.dumps(fixture_analysis, indent=2)}
+{_json_dumps(fixture_analysis)}
 
 USER'S SQUAD: {squad or "All FPL players available for analysis"}
 
@@ -1877,8 +2723,7 @@ Please provide a JSON response with this EXACT structure:
 IMPORTANT: Generate fresh recommendations each time. Vary your analysis based on different factors (form vs fixtures, safe vs differential, etc). Consider current FPL news and trends.
 """
 
-            response = await self.client.chat.completions.create(
-                model=self.model,
+            llm_response = await self._create_completion(
                 messages=[
                     {"role": "system", "content": "You are an expert FPL analyst with access to current news and trends. Generate unique, varied captain recommendations each time."},
                     {"role": "user", "content": prompt}
@@ -1887,96 +2732,80 @@ IMPORTANT: Generate fresh recommendations each time. Vary your analysis based on
                 max_tokens=2000
             )
 
-            llm_response = response.choices[0].message.content
-
             try:
                 # Extract JSON from markdown code blocks if present
-                import re
-                json_match = re.search(r'```json\s*(\{.*?\})\s*```', llm_response, re.DOTALL)
+                json_match = _JSON_CODEBLOCK.search(llm_response)
                 if json_match:
                     json_str = json_match.group(1)
                 else:
                     # Try to find JSON object in response
-                    json_match = re.search(r'\{.*\}', llm_response, re.DOTALL)
-                    if json_match:
-                        json_str = json_match.group(0)
-                    else:
-                        json_str = llm_response
+                    json_str = _extract_json_object(llm_response) or llm_response
 
                 # Parse the extracted JSON
-                recommendation = json.loads(json_str)
+                recommendation = _json_loads(json_str)
 
                 # Add metadata
                 recommendation["data_source"] = "real_fpl_data"
                 recommendation["llm_model"] = self.model
-                recommendation["generated_at"] = datetime.now().isoformat()
+                recommendation["generated_at"] = _now_iso()
 
                 return recommendation
 
             except (json.JSONDecodeError, AttributeError):
                 # If JSON parsing fails, create structured response from text
-                print(f"Failed to parse LLM captain response: {llm_response[:200]}...")
-                return await self._generate_enhanced_mock_captain(players, fixtures, squad, gameweek)
-
-            try:
-                recommendation = json.loads(llm_response)
-                recommendation["data_source"] = "real_fpl_data"
-                recommendation["llm_model"] = self.model
-                recommendation["generated_at"] = datetime.now().isoformat()
-                return recommendation
-
-            except json.JSONDecodeError:
+                logger.warning(f"Failed to parse LLM captain response: {llm_response[:200]}...")
                 return await self._generate_enhanced_mock_captain(players, fixtures, squad, gameweek)
 
         except Exception as e:
-            print(f"Error calling OpenAI API for captain recommendation: {e}")
+            logger.error(f"Error calling OpenAI API for captain recommendation: {e}")
             return await self._generate_enhanced_mock_captain(players, fixtures, squad, gameweek)
 
     def _get_top_captain_candidates(self, players: List[Dict]) -> List[Dict]:
         """Get top captain candidates based on attacking potential"""
-        candidates = []
-
-        for player in players:
-            # Focus on attacking players (MID/FWD with good stats)
-            if player.get("position") in ["MID", "FWD"]:
-                goals = player.get("goals_scored", 0)
-                assists = player.get("assists", 0)
-                form = player.get("form", 0)
-                points = player.get("total_points", 0)
-
-                # Calculate captain score
-                captain_score = (goals * 6) + (assists * 3) + (form * 2) + (points * 0.1)
-
-                if captain_score > 10:  # Minimum threshold
-                    candidates.append({
-                        "name": player.get("name"),
-                        "team": player.get("team"),
-                        "position": player.get("position"),
-                        "price": player.get("price"),
-                        "goals": goals,
-                        "assists": assists,
-                        "form": form,
-                        "total_points": points,
-                        "ownership": player.get("selected_by_percent", 0),
-                        "captain_score": captain_score
-                    })
+        if not players:
+            return []
 
-        # Sort by captain score and return top 10
-        return sorted(candidates, key=lambda x: x["captain_score"], reverse=True)[:10]
+        table = get_player_table(players)
+
+        # Captain score for every player, computed once per player table
+        captain_scores = table.captain_score
+
+        # Focus on attacking players (MID/FWD) above the minimum threshold
+        attacking = table.position >= POSITION_CODES["MID"]
+        top_indices = table.top_indices(captain_scores, attacking & (captain_scores > 10), 10)
+
+        # Build records only for the selected rows, reading the record slots directly
+        return [
+            {
+                "name": player.name,
+                "team": player.team,
+                "position": player.position,
+                "price": player.price,
+                "goals": player.goals_scored,
+                "assists": player.assists,
+                "form": player.form,
+                "total_points": player.total_points,
+                "ownership": player.selected_by_percent,
+                "captain_score": score
+            }
+            for player, score in zip(map(players.__getitem__, top_indices), captain_scores[top_indices].tolist())
+        ]
 
     def _analyze_captain_fixtures(self, fixtures: List[Dict], candidates: List[Dict]) -> List[Dict]:
         """Analyze fixtures for captain candidates"""
         fixture_analysis = []
 
+        # First fixture for each team, home or away, built in one pass
+        first_fixture = {}
+        for fixture in fixtures:
+            first_fixture.setdefault(fixture.get("team_h"), fixture)
+            first_fixture.setdefault(fixture.get("team_a"), fixture)
+
         for candidate in candidates[:5]:  # Top 5 candidates
             team_name = candidate.get("team")
 
             # Find upcoming fixture for this team
-            team_fixture = None
-            for fixture in fixtures:
-                if fixture.get("team_h") == team_name or fixture.get("team_a") == team_name:
-                    team_fixture = fixture
-                    break
+            team_fixture = first_fixture.get(team_name)
 
             if team_fixture:
                 is_home = team_fixture.get("team_h") == team_name
@@ -2006,39 +2835,43 @@ IMPORTANT: Generate fresh recommendations each time. Vary your analysis based on
         top_captains = self._get_top_captain_candidates(players)
         fixture_analysis = self._analyze_captain_fixtures(fixtures, top_captains)
 
+        # Index fixture info by player; keep the first entry per name like the old scan did
+        fixtures_by_player = {}
+        for fixture_info in fixture_analysis:
+            fixtures_by_player.setdefault(fixture_info.get("player"), fixture_info)
+
         recommendations = []
         for i, captain in enumerate(top_captains[:3]):
+            # Candidate records always carry every key, so index them directly
+            name, team, form = captain["name"], captain["team"], captain["form"]
+
             # Find fixture info for this captain
-            captain_fixture = None
-            for fixture_info in fixture_analysis:
-                if fixture_info.get("player") == captain.get("name"):
-                    captain_fixture = fixture_info
-                    break
+            captain_fixture = fixtures_by_player.get(name)
 
             # Build fixture string
             if captain_fixture:
-                team = captain_fixture.get("team", captain.get("team", "Unknown"))
+                fixture_team = captain_fixture.get("team", team)
                 opponent = captain_fixture.get("opponent", "TBD")
                 home_away = captain_fixture.get("home_away", "?")
-                fixture_str = f"{team} vs {opponent} ({home_away})"
+                fixture_str = f"{fixture_team} vs {opponent} ({home_away})"
                 difficulty = captain_fixture.get("difficulty", 3)
             else:
                 # Fallback if no fixture found
-                fixture_str = f"{captain.get('team', 'Unknown')} vs TBD"
+                fixture_str = f"{team} vs TBD"
                 difficulty = 3
 
             recommendations.append({
-                "player_name": captain.get("name", "Unknown"),
-                "team": captain.get("team", "Unknown"),
-                "position": captain.get("position", "Unknown"),
+                "player_name": name,
+                "team": team,
+                "position": captain["position"],
                 "confidence": max(0.95 - (i * 0.05), 0.75),  # Decreasing confidence
                 "predicted_points": max(15 - (i * 1.5), 10),  # Decreasing points
-                "reasoning": f"Strong form ({captain.get('form', 0)}) with {captain.get('goals', 0)} goals and {captain.get('assists', 0)} assists. Total points: {captain.get('total_points', 0)}",
+                "reasoning": _CAPTAIN_REASONING % (form, captain["goals"], captain["assists"], captain["total_points"]),
                 "fixture": fixture_str,
                 "fixture_difficulty": difficulty,
-                "form_score": captain.get("form", 0),
-                "ownership": f"{captain.get('ownership', 0)}%",
-                "historical_performance": f"Captain score: {captain.get('captain_score', 0):.1f}"
+                "form_score": form,
+                "ownership": f"{captain['ownership']}%",
+                "historical_performance": f"Captain score: {captain['captain_score']:.1f}"
             })
 
         return {
@@ -2067,77 +2900,11 @@ IMPORTANT: Generate fresh recommendations each time. Vary your analysis based on
     ) -> Dict[str, Any]:
         """Generate a quick fallback captain recommendation when database is unavailable"""
 
-        return {
-            "recommendation_type": "captaincy",
-            "gameweek": gameweek or 1,
-            "recommendations": [
-                {
-                    "player_name": "Haaland",
-                    "team": "Manchester City",
-                    "position": "FWD",
-                    "confidence": 0.90,
-                    "predicted_points": 14,
-                    "reasoning": "Premium striker with excellent goal scoring record. Consistent captain choice.",
-                    "fixture": "Manchester City vs TBD (H)",
-                    "fixture_difficulty": 2,
-                    "form_score": 8.5,
-                    "ownership": "45%",
-                    "historical_performance": "Averages 12+ points as captain"
-                },
-                {
-                    "player_name": "Salah",
-                    "team": "Liverpool",
-                    "position": "MID",
-                    "confidence": 0.85,
-                    "predicted_points": 12,
-                    "reasoning": "Reliable midfielder with penalty duties. Strong home record.",
-                    "fixture": "Liverpool vs TBD (H)",
-                    "fixture_difficulty": 2,
-                    "form_score": 7.8,
-                    "ownership": "35%",
-                    "historical_performance": "Consistent double-digit returns"
-                },
-                {
-                    "player_name": "Palmer",
-                    "team": "Chelsea",
-                    "position": "MID",
-                    "confidence": 0.80,
-                    "predicted_points": 11,
-                    "reasoning": "In excellent form with penalty duties. Good differential option.",
-                    "fixture": "Chelsea vs TBD (H)",
-                    "fixture_difficulty": 3,
-                    "form_score": 8.2,
-                    "ownership": "25%",
-                    "historical_performance": "Strong underlying stats"
-                }
-            ],
-            "analysis": {
-                "data_source": "fallback_recommendation",
-                "safe_pick": "Haaland",
-                "differential_pick": "Palmer",
-                "avoid": ["Rotation risks", "Difficult away fixtures"],
-                "key_factors": [
-                    "Form and goal scoring record",
-                    "Fixture difficulty",
-                    "Ownership for differential opportunities"
-                ]
-            },
-            "ai_summary": "Haaland remains the safest captain choice with 90% confidence. Palmer offers good differential value at lower ownership. Avoid rotation-prone players.",
-            "data_source": "fallback_data"
-        }
+        return {**_FALLBACK_CAPTAIN, "gameweek": gameweek or 1}
 
     async def _analyze_historical_captains(self) -> Dict[str, Any]:
-        """Analyze historical captain performance data"""
-        return {
-            "top_captains_last_season": [
-                {"name": "Haaland", "avg_points": 12.8, "home_avg": 14.2, "away_avg": 11.4, "15_plus_games": 8},
-                {"name": "Palmer", "avg_points": 11.2, "home_avg": 12.1, "away_avg": 10.3, "15_plus_games": 5},
-                {"name": "Saka", "avg_points": 10.5, "home_avg": 11.8, "away_avg": 9.2, "15_plus_games": 4}
-            ],
-            "penalty_takers": ["Palmer", "Saka", "Salah"],
-            "home_specialists": ["Haaland", "Saka", "Son"],
-            "differential_captains": ["Palmer", "Watkins", "Isak"]
-        }
+        """Analyze historical captain performance data (shared, treat as read-only)"""
+        return _HISTORICAL_CAPTAINS
 
     async def get_chip_recommendations(
         self,
@@ -2145,48 +2912,15 @@ IMPORTANT: Generate fresh recommendations each time. Vary your analysis based on
         current_gameweek: int
     ) -> Dict[str, Any]:
         """Generate AI-powered chip usage recommendations"""
-        
-        await asyncio.sleep(0.5)  # Simulate API call
-        
+
+        # Only the target gameweeks depend on the request; everything else is shared
         return {
-            "recommendation_type": "chip_strategy",
+            **_CHIP_STRATEGY,
             "current_gameweek": current_gameweek,
             "recommendations": [
-                {
-                    "chip": "Triple Captain",
-                    "recommended_gameweek": current_gameweek + 2,
-                    "confidence": 0.85,
-                    "reasoning": "Double gameweek with Haaland having two home fixtures",
-                    "best_targets": ["Haaland", "Salah", "Palmer"],
-                    "expected_gain": 15.5
-                },
-                {
-                    "chip": "Bench Boost",
-                    "recommended_gameweek": current_gameweek + 5,
-                    "confidence": 0.78,
-                    "reasoning": "Build strong bench during international break",
-                    "preparation_needed": "Invest in playing bench players",
-                    "expected_gain": 12.8
-                },
-                {
-                    "chip": "Free Hit",
-                    "recommended_gameweek": current_gameweek + 8,
-                    "confidence": 0.72,
-                    "reasoning": "Blank gameweek with limited fixtures",
-                    "strategy": "Target teams with fixtures in blank gameweek",
-                    "expected_gain": 20.2
-                }
-            ],
-            "analysis": {
-                "priority_order": ["Triple Captain", "Bench Boost", "Free Hit"],
-                "timing_importance": "High - Chip timing can swing ranks significantly",
-                "preparation_tips": [
-                    "Monitor double gameweek announcements",
-                    "Build bench strength 2-3 weeks before Bench Boost",
-                    "Save Free Hit for biggest blank gameweek"
-                ]
-            },
-            "ai_summary": "Triple Captain in the upcoming double gameweek offers the best immediate value. Plan bench investments for Bench Boost, and save Free Hit for the major blank gameweek."
+                {**recommendation, "recommended_gameweek": current_gameweek + offset}
+                for offset, recommendation in _CHIP_RECOMMENDATIONS
+            ]
         }
     
     async def analyze_player_query(
@@ -2196,31 +2930,46 @@ IMPORTANT: Generate fresh recommendations each time. Vary your analysis based on
     ) -> Dict[str, Any]:
         """Analyze natural language queries using historical data-aware AI"""
 
+        # Repeated questions over the same data reuse the earlier answer
+        key = _query_cache_key(query, context)
+        cached = _query_results.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return {**cached[1]}
+
         # Use the new historical AI service for intelligent recommendations
-        historical_ai = HistoricalAIService(db=self.db)
+        if self._historical_ai is None:
+            from app.services.historical_ai_service import HistoricalAIService
+            self._historical_ai = HistoricalAIService(db=self.db)
 
         try:
-            return await historical_ai.analyze_player_query_historical(query, context)
+            response = await self._historical_ai.analyze_player_query_historical(query, context)
+            # Answers that stood in for a failed LLM call are not kept
+            if not response.get("fallback"):
+                _query_results.set(key, (time.monotonic() + settings.QUERY_CACHE_TTL, response))
+            return {**response}
         except Exception as e:
-            print(f"Error with historical AI service: {e}")
+            logger.error(f"Error with historical AI service: {e}")
             # Fallback to original method
             return await self._analyze_player_query_fallback(query, context)
 
     async def _analyze_player_query_fallback(
         self,
         query: str,
-        context: Optional[Dict] = None
+        context: Optional[Dict] = None,
+        on_token: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
         """Fallback method using original AI logic"""
 
-        # Fetch real data
-        players = await self._fetch_real_player_data()
-        fixtures = await self._fetch_real_fixture_data()
-        teams = await self._fetch_real_team_data()
+        # Fetch real data; each read is TTL-cached, so cold misses overlap and warm hits are free
+        players, fixtures, teams = await asyncio.gather(
+            self._fetch_real_player_data(),
+            self._fetch_real_fixture_data(),
+            self._fetch_real_team_data()
+        )
 
         if self.use_llm and self.client:
             return await self._generate_llm_query_response(
-                query, context, players, fixtures, teams
+                query, context, players, fixtures, teams, on_token=on_token
             )
         else:
             return await self._generate_enhanced_mock_query_response(
@@ -2233,60 +2982,39 @@ IMPORTANT: Generate fresh recommendations each time. Vary your analysis based on
         context: Optional[Dict],
         players: List[Dict],
         fixtures: List[Dict],
-        teams: List[Dict]
+        teams: List[Dict],
+        on_token: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
-        """Generate query response using OpenAI LLM with real data"""
+        """Generate query response using OpenAI LLM with real data, streaming to ``on_token`` if given"""
 
         try:
             # Prepare relevant data based on query
-            relevant_players = self._get_relevant_players_for_query(query, players)
+            relevant_players = self._get_relevant_players_for_query(_query_tags(query.lower()), players)
             relevant_fixtures = fixtures[:5]  # Next 5 fixtures
 
-            prompt = f"""
-You are an expert Fantasy Premier League (FPL) analyst. Answer the user's question using the real FPL data provided.
-
-USER QUESTION: "{query}"
-CONTEXT: {context or "None provided"}
-
-RELEVANT PLAYER DATA:
-{json.dumps(relevant_players, indent=2)}
-
-UPCOMING FIXTURES:
-{json.dumps(relevant_fixtures, indent=2)}
-
-Please provide a JSON response with the following structure:
-{{
-    "query_type": "descriptive_category",
-    "response": "Detailed answer based on real data",
-    "confidence": <0.0_to_1.0>,
-    "supporting_data": {{
-        "key_stats": ["stat1", "stat2", "stat3"],
-        "player_recommendations": ["player1", "player2"],
-        "reasoning": "Why these recommendations"
-    }},
-    "actionable_advice": ["specific action 1", "specific action 2"]
-}}
-
-Base your answer on the real data provided. Include specific statistics, player names, and concrete recommendations.
-"""
+            prompt = _QUERY_PROMPT.format_map({
+                "query": query,
+                "context": context or "None provided",
+                "players": _json_dumps([player.to_dict() for player in relevant_players]),
+                "fixtures": _json_dumps(relevant_fixtures)
+            })
 
-            response = await self.client.chat.completions.create(
-                model=self.model,
+            llm_response = await self._create_completion(
                 messages=[
                     {"role": "system", "content": "You are an expert FPL analyst providing data-driven advice based on real player statistics and fixtures."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.4,
-                max_tokens=1000
+                max_tokens=1000,
+                on_token=on_token,
+                response_format=_QUERY_RESPONSE_FORMAT
             )
 
-            llm_response = response.choices[0].message.content
-
             try:
-                recommendation = json.loads(llm_response)
+                recommendation = _json_loads(llm_response)
                 recommendation["data_source"] = "real_fpl_data"
                 recommendation["llm_model"] = self.model
-                recommendation["generated_at"] = datetime.now().isoformat()
+                recommendation["generated_at"] = _now_iso()
                 return recommendation
 
             except json.JSONDecodeError:
@@ -2303,33 +3031,29 @@ Base your answer on the real data provided. Include specific statistics, player
                 }
 
         except Exception as e:
-            print(f"Error calling OpenAI API for query: {e}")
+            logger.error(f"Error calling OpenAI API for query: {e}")
             return await self._generate_enhanced_mock_query_response(
                 query, context, players, fixtures, teams
             )
 
-    def _get_relevant_players_for_query(self, query: str, players: List[Dict]) -> List[Dict]:
-        """Get players relevant to the query"""
-        query_lower = query.lower()
+    def _get_relevant_players_for_query(self, tags: frozenset, players: List[Dict]) -> List[Dict]:
+        """Get players relevant to a query, given its keyword tags from ``_query_tags``"""
         relevant_players = []
 
         # If asking about specific positions
-        if "goalkeeper" in query_lower or "gk" in query_lower:
-            relevant_players = [p for p in players if p.get("position") == "GK"][:5]
-        elif "defender" in query_lower or "defence" in query_lower:
-            relevant_players = [p for p in players if p.get("position") == "DEF"][:10]
-        elif "midfielder" in query_lower or "midfield" in query_lower:
-            relevant_players = [p for p in players if p.get("position") == "MID"][:10]
-        elif "forward" in query_lower or "striker" in query_lower:
-            relevant_players = [p for p in players if p.get("position") == "FWD"][:10]
+        table = get_player_table(players)
+        by_position = table.by_position
+        if "GK" in tags:
+            relevant_players = by_position["GK"][:5]
+        elif "DEF" in tags:
+            relevant_players = by_position["DEF"][:10]
+        elif "MID" in tags:
+            relevant_players = by_position["MID"][:10]
+        elif "FWD" in tags:
+            relevant_players = by_position["FWD"][:10]
         else:
-            # General query - get top performers
-            sorted_players = sorted(
-                players,
-                key=lambda x: x.get("total_points", 0) + (x.get("form", 0) * 2),
-                reverse=True
-            )
-            relevant_players = sorted_players[:15]
+            # General query - get top performers, ranked once per player table
+            relevant_players = table.top_overall[:15]
 
         return relevant_players
 
@@ -2343,10 +3067,10 @@ Base your answer on the real data provided. Include specific statistics, player
     ) -> Dict[str, Any]:
         """Generate enhanced mock response using real data"""
 
-        query_lower = query.lower()
-        relevant_players = self._get_relevant_players_for_query(query, players)
+        tags = _query_tags(query.lower())
+        relevant_players = self._get_relevant_players_for_query(tags, players)
 
-        if "captain" in query_lower or "who should i captain" in query_lower:
+        if "CAPTAIN" in tags:
             captain_recs = await self.get_captain_recommendations()
             return {
                 "query_type": "captaincy_advice",
@@ -2355,72 +3079,51 @@ Base your answer on the real data provided. Include specific statistics, player
                 "detailed_recommendations": captain_recs['recommendations'][:3],
                 "historical_context": "Analysis based on last season's performance in similar fixtures and current form trends."
             }
-        elif "transfer" in query_lower or "who should i bring in" in query_lower:
-            return {
-                "query_type": "transfer_advice",
-                "response": "Based on historical performance and upcoming fixtures, I'd prioritize Palmer and Mbeumo as transfer targets. Palmer scored 22 goals + 11 assists last season and is on penalties, while Mbeumo has 8 goals in his last 6 games and historically overperforms in favorable fixtures.",
-                "confidence": 0.87,
-                "supporting_data": {
-                    "palmer_historical": "22 goals + 11 assists last season, 9/9 penalties scored",
-                    "mbeumo_form": "8 goals in last 6 games, 3.2 xG indicates sustainability",
-                    "fixture_analysis": "Both have historically performed well vs upcoming opponents",
-                    "value_analysis": "Palmer £11.0m (premium but essential), Mbeumo £7.5m (excellent value)"
-                },
-                "transfer_priorities": [
-                    {"player": "Palmer", "priority": 1, "reasoning": "Essential due to penalties and underlying stats"},
-                    {"player": "Mbeumo", "priority": 2, "reasoning": "Exceptional value with strong recent form"},
-                    {"player": "Saka", "priority": 3, "reasoning": "Consistent performer with good home record"}
-                ]
-            }
-        elif any(word in query_lower for word in ["best", "recommend", "pick", "team"]):
-            return {
-                "query_type": "general_recommendation",
-                "response": "For the upcoming gameweek, focus on players with strong home fixtures and historical performance. Haaland (36 goals last season), Palmer (22 goals + 11 assists), and Saka (16 goals + 9 assists) are premium options. For value, consider Mbeumo (8 goals in 6 games) and Rogers (4 assists in 5 games).",
-                "confidence": 0.88,
-                "key_picks": [
-                    {"name": "Haaland", "price": "£15.0m", "reasoning": "36 goals last season, averages 2.1 goals vs upcoming opponent"},
-                    {"name": "Palmer", "price": "£11.0m", "reasoning": "22 goals + 11 assists last season, on penalties"},
-                    {"name": "Mbeumo", "price": "£7.5m", "reasoning": "8 goals in 6 games, historically strong in good fixtures"},
-                    {"name": "Saka", "price": "£10.0m", "reasoning": "16 goals + 9 assists last season, excellent home record"}
-                ],
-                "formation_advice": "3-5-2 recommended for midfield strength with premium forwards"
-            }
-        elif "differential" in query_lower or "template" in query_lower:
-            return {
-                "query_type": "differential_advice",
-                "response": "For differentials, consider Palmer (28.7% ownership vs 45.2% for Haaland), Watkins (strong home record, 19 goals last season), or Isak (Newcastle's main threat). Avoid template picks if you need to climb ranks.",
-                "confidence": 0.82,
-                "differential_picks": [
-                    {"name": "Palmer", "ownership": "28.7%", "reasoning": "Lower owned than Haaland but similar ceiling"},
-                    {"name": "Watkins", "ownership": "22.1%", "reasoning": "19 goals last season, strong home record"},
-                    {"name": "Isak", "ownership": "18.5%", "reasoning": "Newcastle's main threat, good fixtures ahead"}
-                ],
-                "template_warning": "High ownership players (Haaland 45.2%, Saka 52.1%) are safer but offer less rank climbing potential"
-            }
-        elif "fixture" in query_lower or "difficulty" in query_lower:
-            return {
-                "query_type": "fixture_analysis",
-                "response": "This gameweek favors home teams with Arsenal, Chelsea, and Man City all playing at home. Historically, these teams score 2+ goals in 70%+ of home games. Avoid away players vs strong defenses.",
-                "confidence": 0.85,
-                "fixture_insights": [
-                    {"team": "Arsenal", "fixture": "vs Leicester (H)", "historical": "Scored 2+ goals in 18/19 home games last season"},
-                    {"team": "Man City", "fixture": "vs Bournemouth (H)", "historical": "Averaged 3.2 goals at home vs promoted teams"},
-                    {"team": "Chelsea", "fixture": "vs Brentford (H)", "historical": "Won 8/10 recent home games vs Brentford"}
-                ]
-            }
+        elif "TRANSFER" in tags:
+            return {**_MOCK_TRANSFER_REPLY}
+        elif "PICK" in tags:
+            return {**_MOCK_PICK_REPLY}
+        elif "DIFFERENTIAL" in tags:
+            return {**_MOCK_DIFFERENTIAL_REPLY}
+        elif "FIXTURE" in tags:
+            return {**_MOCK_FIXTURE_REPLY}
         else:
             return {
-                "query_type": "general_analysis",
-                "response": f"I understand you're asking about: '{query}'. Based on historical FPL data and current trends, I recommend focusing on players with proven track records in similar fixtures. Key factors: home advantage (worth ~2.3 points historically), penalty takers (higher floor), and players with strong underlying stats (xG, xA).",
-                "confidence": 0.78,
-                "suggestions": [
-                    "Prioritize home players - they averaged 2.3 more points last season",
-                    "Target penalty takers for higher floor (Palmer, Saka, Salah)",
-                    "Check historical head-to-head records vs upcoming opponents",
-                    "Balance premium picks (proven performers) with value options (form players)"
-                ],
-                "historical_context": "Analysis based on 2024-25 season data and similar gameweek patterns"
+                **_MOCK_GENERAL_REPLY,
+                "response": f"I understand you're asking about: '{query}'. Based on historical FPL data and current trends, I recommend focusing on players with proven track records in similar fixtures. Key factors: home advantage (worth ~2.3 points historically), penalty takers (higher floor), and players with strong underlying stats (xG, xA)."
             }
 
-# Global AI service instance
-ai_service = AIService()
+# Global AI service instance, created on first use rather than at import time
+_ai_service: Optional[AIService] = None
+
+
+def get_ai_service() -> AIService:
+    """Return the shared AIService instance, creating it on first call"""
+    global _ai_service
+    if _ai_service is None:
+        _ai_service = AIService()
+    return _ai_service
+
+
+async def refresh_data_snapshot() -> None:
+    """Reload players, fixtures and teams from the database into the shared caches"""
+    db = SessionLocal()
+    try:
+        service = AIService(db=db)
+        await asyncio.gather(
+            AIService._fetch_real_player_data.refresh(service),
+            AIService._fetch_real_fixture_data.refresh(service),
+            AIService._fetch_real_team_data.refresh(service)
+        )
+    finally:
+        db.close()
+
+
+async def run_data_refresher(interval_seconds: float) -> None:
+    """Refresh the data snapshot now and then every ``interval_seconds`` until cancelled"""
+    while True:
+        try:
+            await refresh_data_snapshot()
+        except Exception as e:
+            logger.error(f"Error refreshing data snapshot: {e}")
+        await asyncio.sleep(interval_seconds)
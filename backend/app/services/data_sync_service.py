@@ -1,17 +1,34 @@
 import asyncio
+import io
+import json
 import logging
-from typing import List, Dict, Any, Optional
+import uuid
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import func, or_, select, text, table as sql_table, column as sql_column
+from sqlalchemy.dialects import mysql, postgresql, sqlite
 
 from app.db.database import SessionLocal
 from app.db.models import Player, Team, Fixture, PlayerGameweekStats
 from app.services.fpl_api_service import fpl_api
 from app.core.config import settings
+from app.core.cache import invalidate_cache, invalidate_redis_cache
 
 logger = logging.getLogger(__name__)
 
+# INSERT constructs with upsert support, by dialect name: ON CONFLICT DO UPDATE, or
+# ON DUPLICATE KEY UPDATE for MySQL. Other dialects upsert row by row through the ORM
+_UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+    "mysql": mysql.insert,
+}
+
+# PostgreSQL upserts of more rows than this are staged with COPY instead of sent as
+# INSERT parameters
+_COPY_MIN_ROWS = 100
+
 class DataSyncService:
     """Service for syncing data from FPL API to local database"""
     
@@ -46,6 +63,10 @@ class DataSyncService:
                     await self.sync_gameweek_stats(api, current_gw)
                 
                 self.last_sync = datetime.now()
+
+                # Drop cached player/fixture/team reads so the next request sees fresh data
+                invalidate_cache()
+                await invalidate_redis_cache()
                 logger.info("Full data sync completed successfully")
                 return True
                 
@@ -65,38 +86,8 @@ class DataSyncService:
             
             db = SessionLocal()
             try:
-                for team_data in teams_data:
-                    # Check if team exists
-                    existing_team = db.query(Team).filter(Team.code == team_data['code']).first()
-                    
-                    if existing_team:
-                        # Update existing team
-                        existing_team.name = team_data['name']
-                        existing_team.short_name = team_data['short_name']
-                        existing_team.strength = team_data.get('strength', 3)
-                        existing_team.strength_overall_home = team_data.get('strength_overall_home', 3)
-                        existing_team.strength_overall_away = team_data.get('strength_overall_away', 3)
-                        existing_team.strength_attack_home = team_data.get('strength_attack_home', 3)
-                        existing_team.strength_attack_away = team_data.get('strength_attack_away', 3)
-                        existing_team.strength_defence_home = team_data.get('strength_defence_home', 3)
-                        existing_team.strength_defence_away = team_data.get('strength_defence_away', 3)
-                    else:
-                        # Create new team
-                        new_team = Team(
-                            id=team_data['id'],
-                            name=team_data['name'],
-                            short_name=team_data['short_name'],
-                            code=team_data['code'],
-                            strength=team_data.get('strength', 3),
-                            strength_overall_home=team_data.get('strength_overall_home', 3),
-                            strength_overall_away=team_data.get('strength_overall_away', 3),
-                            strength_attack_home=team_data.get('strength_attack_home', 3),
-                            strength_attack_away=team_data.get('strength_attack_away', 3),
-                            strength_defence_home=team_data.get('strength_defence_home', 3),
-                            strength_defence_away=team_data.get('strength_defence_away', 3)
-                        )
-                        db.add(new_team)
-                
+                rows = [self._team_row(team_data) for team_data in teams_data]
+                self._bulk_upsert(db, Team, rows, ("code",), immutable=("id",))
                 db.commit()
                 logger.info(f"Successfully synced {len(teams_data)} teams")
                 return True
@@ -120,18 +111,8 @@ class DataSyncService:
             
             db = SessionLocal()
             try:
-                for player_data in players_data:
-                    # Check if player exists
-                    existing_player = db.query(Player).filter(Player.id == player_data['id']).first()
-                    
-                    if existing_player:
-                        # Update existing player
-                        self._update_player_from_api_data(existing_player, player_data)
-                    else:
-                        # Create new player
-                        new_player = self._create_player_from_api_data(player_data)
-                        db.add(new_player)
-                
+                rows = [self._player_row(player_data) for player_data in players_data]
+                self._bulk_upsert(db, Player, rows, ("id",), immutable=("element_type",))
                 db.commit()
                 logger.info(f"Successfully synced {len(players_data)} players")
                 return True
@@ -155,18 +136,12 @@ class DataSyncService:
             
             db = SessionLocal()
             try:
-                for fixture_data in fixtures_data:
-                    # Check if fixture exists
-                    existing_fixture = db.query(Fixture).filter(Fixture.code == fixture_data['code']).first()
-                    
-                    if existing_fixture:
-                        # Update existing fixture
-                        self._update_fixture_from_api_data(existing_fixture, fixture_data)
-                    else:
-                        # Create new fixture
-                        new_fixture = self._create_fixture_from_api_data(fixture_data)
-                        db.add(new_fixture)
-                
+                rows = [self._fixture_row(fixture_data) for fixture_data in fixtures_data]
+                self._bulk_upsert(
+                    db, Fixture, rows, ("code",),
+                    immutable=("id", "team_h_id", "team_a_id"),
+                    keep_existing=("kickoff_time",)
+                )
                 db.commit()
                 logger.info(f"Successfully synced {len(fixtures_data)} fixtures")
                 return True
@@ -190,25 +165,11 @@ class DataSyncService:
             
             db = SessionLocal()
             try:
-                for player_id, stats in live_data['elements'].items():
-                    player_id = int(player_id)
-                    
-                    # Check if stats already exist
-                    existing_stats = db.query(PlayerGameweekStats).filter(
-                        and_(
-                            PlayerGameweekStats.player_id == player_id,
-                            PlayerGameweekStats.gameweek == gameweek
-                        )
-                    ).first()
-                    
-                    if existing_stats:
-                        # Update existing stats
-                        self._update_gameweek_stats_from_api_data(existing_stats, stats)
-                    else:
-                        # Create new stats
-                        new_stats = self._create_gameweek_stats_from_api_data(player_id, gameweek, stats)
-                        db.add(new_stats)
-                
+                rows = [
+                    self._gameweek_stats_row(int(player_id), gameweek, stats)
+                    for player_id, stats in live_data['elements'].items()
+                ]
+                self._bulk_upsert(db, PlayerGameweekStats, rows, ("player_id", "gameweek"))
                 db.commit()
                 logger.info(f"Successfully synced gameweek {gameweek} stats")
                 return True
@@ -220,191 +181,242 @@ class DataSyncService:
             logger.error(f"Error syncing gameweek stats: {e}")
             return False
     
-    def _create_player_from_api_data(self, data: Dict[str, Any]) -> Player:
-        """Create a Player object from API data"""
-        return Player(
-            id=data['id'],
-            web_name=data['web_name'],
-            first_name=data['first_name'],
-            second_name=data['second_name'],
-            element_type=data['element_type'],
-            team_id=data['team'],
-            now_cost=data['now_cost'],
-            cost_change_start=data.get('cost_change_start', 0),
-            cost_change_event=data.get('cost_change_event', 0),
-            total_points=data.get('total_points', 0),
-            points_per_game=float(data.get('points_per_game', 0)),
-            form=float(data.get('form', 0)),
-            selected_by_percent=float(data.get('selected_by_percent', 0)),
-            transfers_in_event=data.get('transfers_in_event', 0),
-            transfers_out_event=data.get('transfers_out_event', 0),
-            minutes=data.get('minutes', 0),
-            goals_scored=data.get('goals_scored', 0),
-            assists=data.get('assists', 0),
-            clean_sheets=data.get('clean_sheets', 0),
-            goals_conceded=data.get('goals_conceded', 0),
-            own_goals=data.get('own_goals', 0),
-            penalties_saved=data.get('penalties_saved', 0),
-            penalties_missed=data.get('penalties_missed', 0),
-            yellow_cards=data.get('yellow_cards', 0),
-            red_cards=data.get('red_cards', 0),
-            saves=data.get('saves', 0),
-            bonus=data.get('bonus', 0),
-            bps=data.get('bps', 0),
-            expected_goals=float(data.get('expected_goals', 0)),
-            expected_assists=float(data.get('expected_assists', 0)),
-            expected_goal_involvements=float(data.get('expected_goal_involvements', 0)),
-            expected_goals_conceded=float(data.get('expected_goals_conceded', 0)),
-            status=data.get('status', 'a'),
-            news=data.get('news', ''),
-            chance_of_playing_this_round=data.get('chance_of_playing_this_round'),
-            chance_of_playing_next_round=data.get('chance_of_playing_next_round')
-        )
+    def _bulk_upsert(
+        self,
+        db: Session,
+        model: Any,
+        rows: List[Dict[str, Any]],
+        index_elements: Tuple[str, ...],
+        immutable: Tuple[str, ...] = (),
+        keep_existing: Tuple[str, ...] = ()
+    ) -> None:
+        """Insert ``rows`` into ``model``'s table in one statement, updating rows that
+        already exist by ``index_elements``
+
+        Columns in ``immutable`` keep their stored value on conflict, and columns in
+        ``keep_existing`` keep it only when the incoming value is NULL. Large batches on
+        PostgreSQL are copied into a staging table and upserted from there.
+        """
+        if not rows:
+            return
+        
+        bind = db.get_bind()
+        dialect = bind.dialect.name
+        insert = _UPSERT_INSERTS.get(dialect)
+        if insert is None:
+            self._upsert_each(db, model, rows, index_elements, immutable, keep_existing)
+            return
+        
+        stmt = insert(model)
+        table = model.__table__
+        incoming = stmt.inserted if dialect == "mysql" else stmt.excluded
+        set_ = {
+            column: incoming[column]
+            for column in rows[0]
+            if column not in index_elements and column not in immutable
+        }
+        for column in keep_existing:
+            set_[column] = func.coalesce(incoming[column], table.c[column])
+        if "updated_at" in table.c:
+            set_["updated_at"] = func.now()
+        
+        if dialect == "mysql":
+            # MySQL matches on any unique key rather than a named conflict target
+            db.execute(stmt.on_duplicate_key_update(set_), rows)
+        elif dialect == "postgresql" and bind.dialect.driver == "psycopg2" and len(rows) > _COPY_MIN_ROWS:
+            staging, columns = self._copy_to_staging(db, table, rows)
+            staged = sql_table(staging, *(sql_column(name) for name in columns))
+            stmt = stmt.from_select(columns, select(*staged.c))
+            db.execute(stmt.on_conflict_do_update(index_elements=list(index_elements), set_=set_))
+            db.execute(text(f"DROP TABLE {staging}"))
+        else:
+            db.execute(stmt.on_conflict_do_update(index_elements=list(index_elements), set_=set_), rows)
     
-    def _update_player_from_api_data(self, player: Player, data: Dict[str, Any]) -> None:
-        """Update a Player object with API data"""
-        player.web_name = data['web_name']
-        player.first_name = data['first_name']
-        player.second_name = data['second_name']
-        player.team_id = data['team']
-        player.now_cost = data['now_cost']
-        player.cost_change_start = data.get('cost_change_start', 0)
-        player.cost_change_event = data.get('cost_change_event', 0)
-        player.total_points = data.get('total_points', 0)
-        player.points_per_game = float(data.get('points_per_game', 0))
-        player.form = float(data.get('form', 0))
-        player.selected_by_percent = float(data.get('selected_by_percent', 0))
-        player.transfers_in_event = data.get('transfers_in_event', 0)
-        player.transfers_out_event = data.get('transfers_out_event', 0)
-        player.minutes = data.get('minutes', 0)
-        player.goals_scored = data.get('goals_scored', 0)
-        player.assists = data.get('assists', 0)
-        player.clean_sheets = data.get('clean_sheets', 0)
-        player.goals_conceded = data.get('goals_conceded', 0)
-        player.own_goals = data.get('own_goals', 0)
-        player.penalties_saved = data.get('penalties_saved', 0)
-        player.penalties_missed = data.get('penalties_missed', 0)
-        player.yellow_cards = data.get('yellow_cards', 0)
-        player.red_cards = data.get('red_cards', 0)
-        player.saves = data.get('saves', 0)
-        player.bonus = data.get('bonus', 0)
-        player.bps = data.get('bps', 0)
-        player.expected_goals = float(data.get('expected_goals', 0))
-        player.expected_assists = float(data.get('expected_assists', 0))
-        player.expected_goal_involvements = float(data.get('expected_goal_involvements', 0))
-        player.expected_goals_conceded = float(data.get('expected_goals_conceded', 0))
-        player.status = data.get('status', 'a')
-        player.news = data.get('news', '')
-        player.chance_of_playing_this_round = data.get('chance_of_playing_this_round')
-        player.chance_of_playing_next_round = data.get('chance_of_playing_next_round')
+    def _upsert_each(
+        self,
+        db: Session,
+        model: Any,
+        rows: List[Dict[str, Any]],
+        index_elements: Tuple[str, ...],
+        immutable: Tuple[str, ...],
+        keep_existing: Tuple[str, ...]
+    ) -> None:
+        """Row-by-row ``_bulk_upsert`` through the ORM, for dialects without an upsert construct"""
+        for row in rows:
+            existing = db.query(model).filter_by(**{column: row[column] for column in index_elements}).first()
+            if existing is None:
+                db.add(model(**row))
+                continue
+            for column, value in row.items():
+                if column in index_elements or column in immutable:
+                    continue
+                if value is None and column in keep_existing:
+                    continue
+                setattr(existing, column, value)
     
-    def _create_fixture_from_api_data(self, data: Dict[str, Any]) -> Fixture:
-        """Create a Fixture object from API data"""
-        kickoff_time = None
-        if data.get('kickoff_time'):
-            try:
-                kickoff_time = datetime.fromisoformat(data['kickoff_time'].replace('Z', '+00:00'))
-            except:
-                pass
+    def _copy_to_staging(self, db: Session, table: Any, rows: List[Dict[str, Any]]) -> Tuple[str, List[str]]:
+        """COPY ``rows`` into a new temporary table shaped like ``table``, dropped at commit
+
+        Returns the staging table name and its columns. The name is unique per call, so
+        several upserts into one table can share a transaction. Python-side column
+        defaults are filled in here, since an INSERT ... SELECT does not apply them.
+        """
+        defaults = {
+            column.name: column.default.arg
+            for column in table.c
+            if column.name not in rows[0] and column.default is not None and column.default.is_scalar
+        }
+        columns = [*rows[0], *defaults]
+        column_list = ", ".join(columns)
+        staging = f"staging_{table.name}_{uuid.uuid4().hex[:12]}"
+        db.execute(text(
+            f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+            f"SELECT {column_list} FROM {table.name} WITH NO DATA"
+        ))
         
-        return Fixture(
-            id=data['id'],
-            code=data['code'],
-            event=data.get('event'),
-            finished=data.get('finished', False),
-            finished_provisional=data.get('finished_provisional', False),
-            kickoff_time=kickoff_time,
-            minutes=data.get('minutes', 0),
-            provisional_start_time=data.get('provisional_start_time', False),
-            started=data.get('started', False),
-            team_h_id=data['team_h'],
-            team_a_id=data['team_a'],
-            team_h_score=data.get('team_h_score'),
-            team_a_score=data.get('team_a_score'),
-            team_h_difficulty=data.get('team_h_difficulty', 3),
-            team_a_difficulty=data.get('team_a_difficulty', 3),
-            stats=data.get('stats')
-        )
-    
-    def _update_fixture_from_api_data(self, fixture: Fixture, data: Dict[str, Any]) -> None:
-        """Update a Fixture object with API data"""
-        fixture.event = data.get('event')
-        fixture.finished = data.get('finished', False)
-        fixture.finished_provisional = data.get('finished_provisional', False)
-        fixture.minutes = data.get('minutes', 0)
-        fixture.provisional_start_time = data.get('provisional_start_time', False)
-        fixture.started = data.get('started', False)
-        fixture.team_h_score = data.get('team_h_score')
-        fixture.team_a_score = data.get('team_a_score')
-        fixture.team_h_difficulty = data.get('team_h_difficulty', 3)
-        fixture.team_a_difficulty = data.get('team_a_difficulty', 3)
-        fixture.stats = data.get('stats')
+        buffer = io.StringIO()
+        default_fields = "".join("," + _copy_field(value) for value in defaults.values())
+        for row in rows:
+            buffer.write(",".join(_copy_field(value) for value in row.values()) + default_fields + "\n")
+        buffer.seek(0)
         
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+        return staging, columns
+    
+    def _team_row(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Team table row from API data"""
+        return {
+            'id': data['id'],
+            'name': data['name'],
+            'short_name': data['short_name'],
+            'code': data['code'],
+            'strength': data.get('strength', 3),
+            'strength_overall_home': data.get('strength_overall_home', 3),
+            'strength_overall_away': data.get('strength_overall_away', 3),
+            'strength_attack_home': data.get('strength_attack_home', 3),
+            'strength_attack_away': data.get('strength_attack_away', 3),
+            'strength_defence_home': data.get('strength_defence_home', 3),
+            'strength_defence_away': data.get('strength_defence_away', 3)
+        }
+    
+    def _player_row(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Player table row from API data"""
+        return {
+            'id': data['id'],
+            'web_name': data['web_name'],
+            'first_name': data['first_name'],
+            'second_name': data['second_name'],
+            'element_type': data['element_type'],
+            'team_id': data['team'],
+            'now_cost': data['now_cost'],
+            'cost_change_start': data.get('cost_change_start', 0),
+            'cost_change_event': data.get('cost_change_event', 0),
+            'total_points': data.get('total_points', 0),
+            'points_per_game': float(data.get('points_per_game', 0)),
+            'form': float(data.get('form', 0)),
+            'selected_by_percent': float(data.get('selected_by_percent', 0)),
+            'transfers_in_event': data.get('transfers_in_event', 0),
+            'transfers_out_event': data.get('transfers_out_event', 0),
+            'minutes': data.get('minutes', 0),
+            'goals_scored': data.get('goals_scored', 0),
+            'assists': data.get('assists', 0),
+            'clean_sheets': data.get('clean_sheets', 0),
+            'goals_conceded': data.get('goals_conceded', 0),
+            'own_goals': data.get('own_goals', 0),
+            'penalties_saved': data.get('penalties_saved', 0),
+            'penalties_missed': data.get('penalties_missed', 0),
+            'yellow_cards': data.get('yellow_cards', 0),
+            'red_cards': data.get('red_cards', 0),
+            'saves': data.get('saves', 0),
+            'bonus': data.get('bonus', 0),
+            'bps': data.get('bps', 0),
+            'expected_goals': float(data.get('expected_goals', 0)),
+            'expected_assists': float(data.get('expected_assists', 0)),
+            'expected_goal_involvements': float(data.get('expected_goal_involvements', 0)),
+            'expected_goals_conceded': float(data.get('expected_goals_conceded', 0)),
+            'status': data.get('status', 'a'),
+            'news': data.get('news', ''),
+            'chance_of_playing_this_round': data.get('chance_of_playing_this_round'),
+            'chance_of_playing_next_round': data.get('chance_of_playing_next_round')
+        }
+    
+    def _fixture_row(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Fixture table row from API data"""
+        kickoff_time = None
         if data.get('kickoff_time'):
             try:
-                fixture.kickoff_time = datetime.fromisoformat(data['kickoff_time'].replace('Z', '+00:00'))
-            except:
+                kickoff_time = datetime.fromisoformat(data['kickoff_time'].replace('Z', '+00:00'))
+            except (AttributeError, ValueError):
                 pass
-    
-    def _create_gameweek_stats_from_api_data(self, player_id: int, gameweek: int, data: Dict[str, Any]) -> PlayerGameweekStats:
-        """Create PlayerGameweekStats from API data"""
-        stats = data.get('stats', {})
         
-        return PlayerGameweekStats(
-            player_id=player_id,
-            gameweek=gameweek,
-            minutes=stats.get('minutes', 0),
-            goals_scored=stats.get('goals_scored', 0),
-            assists=stats.get('assists', 0),
-            clean_sheets=stats.get('clean_sheets', 0),
-            goals_conceded=stats.get('goals_conceded', 0),
-            own_goals=stats.get('own_goals', 0),
-            penalties_saved=stats.get('penalties_saved', 0),
-            penalties_missed=stats.get('penalties_missed', 0),
-            yellow_cards=stats.get('yellow_cards', 0),
-            red_cards=stats.get('red_cards', 0),
-            saves=stats.get('saves', 0),
-            bonus=stats.get('bonus', 0),
-            bps=stats.get('bps', 0),
-            total_points=stats.get('total_points', 0),
-            expected_goals=float(data.get('expected_goals', 0)),
-            expected_assists=float(data.get('expected_assists', 0)),
-            expected_goal_involvements=float(data.get('expected_goal_involvements', 0)),
-            expected_goals_conceded=float(data.get('expected_goals_conceded', 0)),
-            influence=float(data.get('influence', 0)),
-            creativity=float(data.get('creativity', 0)),
-            threat=float(data.get('threat', 0)),
-            ict_index=float(data.get('ict_index', 0)),
-            value=float(data.get('value', 0))
-        )
+        return {
+            'id': data['id'],
+            'code': data['code'],
+            'event': data.get('event'),
+            'finished': data.get('finished', False),
+            'finished_provisional': data.get('finished_provisional', False),
+            'kickoff_time': kickoff_time,
+            'minutes': data.get('minutes', 0),
+            'provisional_start_time': data.get('provisional_start_time', False),
+            'started': data.get('started', False),
+            'team_h_id': data['team_h'],
+            'team_a_id': data['team_a'],
+            'team_h_score': data.get('team_h_score'),
+            'team_a_score': data.get('team_a_score'),
+            'team_h_difficulty': data.get('team_h_difficulty', 3),
+            'team_a_difficulty': data.get('team_a_difficulty', 3),
+            'stats': data.get('stats')
+        }
     
-    def _update_gameweek_stats_from_api_data(self, stats_obj: PlayerGameweekStats, data: Dict[str, Any]) -> None:
-        """Update PlayerGameweekStats with API data"""
+    def _gameweek_stats_row(self, player_id: int, gameweek: int, data: Dict[str, Any]) -> Dict[str, Any]:
+        """PlayerGameweekStats table row from API data"""
         stats = data.get('stats', {})
         
-        stats_obj.minutes = stats.get('minutes', 0)
-        stats_obj.goals_scored = stats.get('goals_scored', 0)
-        stats_obj.assists = stats.get('assists', 0)
-        stats_obj.clean_sheets = stats.get('clean_sheets', 0)
-        stats_obj.goals_conceded = stats.get('goals_conceded', 0)
-        stats_obj.own_goals = stats.get('own_goals', 0)
-        stats_obj.penalties_saved = stats.get('penalties_saved', 0)
-        stats_obj.penalties_missed = stats.get('penalties_missed', 0)
-        stats_obj.yellow_cards = stats.get('yellow_cards', 0)
-        stats_obj.red_cards = stats.get('red_cards', 0)
-        stats_obj.saves = stats.get('saves', 0)
-        stats_obj.bonus = stats.get('bonus', 0)
-        stats_obj.bps = stats.get('bps', 0)
-        stats_obj.total_points = stats.get('total_points', 0)
-        stats_obj.expected_goals = float(data.get('expected_goals', 0))
-        stats_obj.expected_assists = float(data.get('expected_assists', 0))
-        stats_obj.expected_goal_involvements = float(data.get('expected_goal_involvements', 0))
-        stats_obj.expected_goals_conceded = float(data.get('expected_goals_conceded', 0))
-        stats_obj.influence = float(data.get('influence', 0))
-        stats_obj.creativity = float(data.get('creativity', 0))
-        stats_obj.threat = float(data.get('threat', 0))
-        stats_obj.ict_index = float(data.get('ict_index', 0))
-        stats_obj.value = float(data.get('value', 0))
+        return {
+            'player_id': player_id,
+            'gameweek': gameweek,
+            'minutes': stats.get('minutes', 0),
+            'goals_scored': stats.get('goals_scored', 0),
+            'assists': stats.get('assists', 0),
+            'clean_sheets': stats.get('clean_sheets', 0),
+            'goals_conceded': stats.get('goals_conceded', 0),
+            'own_goals': stats.get('own_goals', 0),
+            'penalties_saved': stats.get('penalties_saved', 0),
+            'penalties_missed': stats.get('penalties_missed', 0),
+            'yellow_cards': stats.get('yellow_cards', 0),
+            'red_cards': stats.get('red_cards', 0),
+            'saves': stats.get('saves', 0),
+            'bonus': stats.get('bonus', 0),
+            'bps': stats.get('bps', 0),
+            'total_points': stats.get('total_points', 0),
+            'expected_goals': float(data.get('expected_goals', 0)),
+            'expected_assists': float(data.get('expected_assists', 0)),
+            'expected_goal_involvements': float(data.get('expected_goal_involvements', 0)),
+            'expected_goals_conceded': float(data.get('expected_goals_conceded', 0)),
+            'influence': float(data.get('influence', 0)),
+            'creativity': float(data.get('creativity', 0)),
+            'threat': float(data.get('threat', 0)),
+            'ict_index': float(data.get('ict_index', 0)),
+            'value': float(data.get('value', 0))
+        }
+
+def _copy_field(value: Any) -> str:
+    """Encode one value as a COPY CSV field
+
+    NULL is the bare empty field, so every other non-numeric value is quoted; an empty
+    or "\\N" string then stays a string.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, (bool, int, float)):
+        return str(value)
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return '"' + str(value).replace('"', '""') + '"'
 
 # Singleton instance
 data_sync_service = DataSyncService()
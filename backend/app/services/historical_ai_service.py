@@ -20,6 +20,13 @@ except ImportError:
     OPENAI_AVAILABLE = False
     print("⚠️ OpenAI package not installed. Install with: pip install openai")
 
+# Prefer orjson for parsing LLM responses; its errors subclass json.JSONDecodeError
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 class HistoricalAIService:
     """AI Service with historical data awareness and gameweek-based logic"""
     
@@ -457,7 +464,7 @@ Respond in JSON format with detailed analysis.
             llm_response = response.choices[0].message.content
 
             try:
-                recommendation = json.loads(llm_response)
+                recommendation = _json_loads(llm_response)
                 recommendation["data_source"] = "historical_aware_ai"
                 recommendation["llm_model"] = self.model
                 recommendation["ai_mode"] = ai_mode
@@ -479,14 +486,18 @@ Respond in JSON format with detailed analysis.
                     },
                     "data_source": "historical_aware_ai",
                     "llm_model": self.model,
-                    "data_weights": weights
+                    "data_weights": weights,
+                    "fallback": True
                 }
 
         except Exception as e:
             print(f"Error calling OpenAI API for historical query: {e}")
-            return await self._generate_historical_mock_response(
+            # Marked as a fallback so callers do not cache it in place of a real answer
+            response = await self._generate_historical_mock_response(
                 query, context, historical_data, current_data, config, weights
             )
+            response["fallback"] = True
+            return response
 
     def _format_historical_players(self, players: List[Dict]) -> str:
         """Format historical player data for LLM prompt"""
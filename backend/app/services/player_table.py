@@ -0,0 +1,197 @@
+"""
+Player data containers for Fantasy XI Wizard
+PlayerRec holds one player loaded from the database; PlayerTable keeps a
+structure-of-arrays view over a player list so scoring, filtering and top-K
+selection run as NumPy column operations instead of per-record lookups
+"""
+
+from dataclasses import dataclass, fields
+from functools import cached_property
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+POSITIONS = ("GK", "DEF", "MID", "FWD")
+POSITION_CODES = {position: code for code, position in enumerate(POSITIONS, 1)}
+
+
+@dataclass(slots=True)
+class PlayerRec:
+    """One player as loaded from the database
+
+    Slotted to keep the cached player list compact. ``get`` and ``[]`` read fields
+    the way the recommendation code reads player dicts; ``to_dict`` is for JSON.
+    """
+    id: int
+    name: str
+    web_name: str
+    team: str
+    position: str
+    element_type: int
+    price: float
+    total_points: int
+    form: Optional[float]
+    goals_scored: int
+    assists: int
+    clean_sheets: int
+    minutes: int
+    selected_by_percent: Optional[float]
+    points_per_game: Optional[float]
+    expected_goals: Optional[float]
+    expected_assists: Optional[float]
+    status: Optional[str]
+    news: Optional[str]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in PLAYER_FIELDS}
+
+
+PLAYER_FIELDS = tuple(field.name for field in fields(PlayerRec))
+
+
+def _column(players: List[Dict[str, Any]], key: str, dtype) -> np.ndarray:
+    """Extract one numeric field from every player, treating missing values as 0"""
+    return np.fromiter((player.get(key) or 0 for player in players), dtype=dtype, count=len(players))
+
+
+class PlayerTable:
+    """Structure-of-arrays view over a list of player dicts
+
+    Row ``i`` of every column describes ``players[i]``, so selected indices map
+    straight back to the original dicts.
+    """
+
+    def __init__(self, players: List[Dict[str, Any]]):
+        self.players = players
+        self.position = np.fromiter(
+            (POSITION_CODES.get(player.get("position"), 0) for player in players),
+            dtype=np.int8,
+            count=len(players)
+        )
+        # Counts fit in int16; fractional stats stay float64 so values like 7.3 keep
+        # ranking exactly as they do on the dicts
+        self.goals = _column(players, "goals_scored", np.int16)
+        self.assists = _column(players, "assists", np.int16)
+        self.total_points = _column(players, "total_points", np.int16)
+        self.form = _column(players, "form", np.float64)
+        self.points_per_game = _column(players, "points_per_game", np.float64)
+        self.selected_by_percent = _column(players, "selected_by_percent", np.float64)
+        self.price = _column(players, "price", np.float64)
+
+        # Team as a small integer code, numbered in order of first appearance
+        team_codes: Dict[Any, int] = {}
+        self.team = np.fromiter(
+            (team_codes.setdefault(player.get("team"), len(team_codes)) for player in players),
+            dtype=np.int16,
+            count=len(players)
+        )
+        self.team_names = list(team_codes)
+        self._position_masks: Dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    @cached_property
+    def id_index(self) -> Dict[Any, int]:
+        """Player id -> row"""
+        return {player.get("id"): row for row, player in enumerate(self.players)}
+
+    @cached_property
+    def name_index(self) -> Dict[Any, int]:
+        """Player name -> row of the first player with that name"""
+        index: Dict[Any, int] = {}
+        for row, player in enumerate(self.players):
+            index.setdefault(player.get("name"), row)
+        return index
+
+    @cached_property
+    def by_position(self) -> Dict[Any, List[Any]]:
+        """Players bucketed by position, each bucket in list order"""
+        buckets: Dict[Any, List[Any]] = {position: [] for position in POSITIONS}
+        for player in self.players:
+            buckets.setdefault(player.get("position"), []).append(player)
+        return buckets
+
+    def position_mask(self, position: Optional[str]) -> np.ndarray:
+        """Row mask for ``position`` (unknown positions match code 0), built once per position
+
+        The mask is shared between callers, so combine it into new arrays rather than
+        modifying it in place.
+        """
+        code = POSITION_CODES.get(position, 0)
+        mask = self._position_masks.get(code)
+        if mask is None:
+            mask = self._position_masks[code] = self.position == code
+        return mask
+
+    @cached_property
+    def names(self) -> np.ndarray:
+        """Player names as an object array, for vectorized exclusion by name"""
+        return np.array([player.get("name") for player in self.players], dtype=object)
+
+    @cached_property
+    def captain_score(self) -> np.ndarray:
+        """goals * 6 + assists * 3 + form * 2 + total_points * 0.1, computed once per table
+
+        Accumulates in place through a single scratch buffer rather than allocating a
+        temporary array for every term.
+        """
+        score = np.multiply(self.goals, 6, dtype=np.float64)
+        scratch = np.multiply(self.assists, 3, dtype=np.float64)
+        score += scratch
+        np.multiply(self.form, 2, out=scratch)
+        score += scratch
+        np.multiply(self.total_points, 0.1, out=scratch)
+        score += scratch
+        return score
+
+    @cached_property
+    def value_score(self) -> np.ndarray:
+        """total_points / price + form * 2, the value ranking used for squad building"""
+        return self.total_points / np.maximum(self.price, 0.1) + self.form * 2
+
+    @cached_property
+    def top_overall(self) -> List[Any]:
+        """The 20 best players by total_points + form * 2, best first (ties keep list order)"""
+        score = self.total_points + self.form * 2
+        everyone = np.ones(len(self), dtype=bool)
+        return [self.players[i] for i in self.top_indices(score, everyone, 20)]
+
+    def transfer_score(self, team_fixture_scores: Dict[Any, float]) -> np.ndarray:
+        """form * 2 + points_per_game * 3 + team fixture score - price * 0.1"""
+        fixture_scores = np.array([team_fixture_scores.get(team, 0.0) for team in self.team_names])
+        return self.form * 2 + self.points_per_game * 3 + fixture_scores[self.team] - self.price * 0.1
+
+    def top_indices(self, scores: np.ndarray, mask: np.ndarray, limit: int) -> np.ndarray:
+        """Indices of the highest ``scores`` within ``mask``, best first (ties keep list order)"""
+        candidates = np.flatnonzero(mask)
+        values = scores[candidates]
+        if 0 < limit < len(candidates):
+            # Partial selection: keep only rows scoring at least the limit-th best value,
+            # so the full sort below runs over a short list
+            cutoff = np.partition(values, len(values) - limit)[len(values) - limit]
+            keep = values >= cutoff
+            candidates, values = candidates[keep], values[keep]
+        order = np.argsort(-values, kind="stable")
+        return candidates[order[:limit]]
+
+
+# The player list is shared through the fetch cache, so its table is built once
+_last_table: Dict[str, Any] = {"players": None, "table": None}
+
+
+def get_player_table(players: List[Dict[str, Any]]) -> PlayerTable:
+    """Return the columnar table for ``players``, reusing it while the list is unchanged"""
+    if _last_table["players"] is not players:
+        _last_table["table"] = PlayerTable(players)
+        _last_table["players"] = players
+    return _last_table["table"]
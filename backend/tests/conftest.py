@@ -0,0 +1,24 @@
+"""
+Shared test setup: the app reads its settings at import time, so point it at a
+throwaway SQLite database and switch off Redis and OpenAI before anything imports it
+"""
+
+import os
+import tempfile
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ["REDIS_URL"] = ""
+os.environ.pop("OPENAI_API_KEY", None)
+
+import pytest
+
+from app.core import cache
+
+
+@pytest.fixture(autouse=True)
+def reset_caches():
+    """Start every test with empty process-wide caches"""
+    cache.invalidate_cache()
+    cache._locks.clear()
+    yield
+    cache.invalidate_cache()
@@ -0,0 +1,148 @@
+"""Tests for AIService chat completion caching and request coalescing"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import ai_service
+from app.services.ai_service import AIService
+
+
+class StubCompletions:
+    """Stands in for client.chat.completions, replying with the prompt text"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+        self.failures = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("provider error")
+        content = kwargs["messages"][-1]["content"]
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@pytest.fixture
+def completions(monkeypatch):
+    monkeypatch.setattr(ai_service, "_completion_cache", ai_service.LRUCache(maxsize=64))
+    monkeypatch.setattr(ai_service, "_inflight_completions", {})
+    return StubCompletions()
+
+
+def make_service(completions):
+    service = AIService(db=None)
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return service
+
+
+def messages(text):
+    return [{"role": "user", "content": text}]
+
+
+def test_identical_concurrent_requests_share_one_call(completions):
+    service = make_service(completions)
+
+    async def run():
+        return await asyncio.gather(*[service._create_completion(messages("same"), 0.7, 10) for _ in range(5)])
+
+    assert asyncio.run(run()) == ["same"] * 5
+    assert completions.calls == 1
+    assert ai_service._inflight_completions == {}
+
+
+def test_cancelling_the_leader_does_not_cancel_waiters(completions):
+    service = make_service(completions)
+
+    async def run():
+        leader = asyncio.create_task(service._create_completion(messages("shared"), 0.7, 10))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.create_task(service._create_completion(messages("shared"), 0.7, 10)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.gather(leader, *waiters, return_exceptions=True)
+
+    leader, *waiters = asyncio.run(run())
+    assert isinstance(leader, asyncio.CancelledError)
+    assert waiters == ["shared", "shared"]
+    # One waiter takes over the call and the other joins it
+    assert completions.calls == 2
+    assert ai_service._inflight_completions == {}
+
+
+def test_cancelling_a_waiter_does_not_cancel_the_leader(completions):
+    service = make_service(completions)
+
+    async def run():
+        leader = asyncio.create_task(service._create_completion(messages("shared"), 0.7, 10))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(service._create_completion(messages("shared"), 0.7, 10))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        return await asyncio.gather(leader, waiter, return_exceptions=True)
+
+    leader, waiter = asyncio.run(run())
+    assert leader == "shared"
+    assert isinstance(waiter, asyncio.CancelledError)
+    assert completions.calls == 1
+
+
+def test_errors_reach_every_waiter_and_are_not_cached(completions):
+    service = make_service(completions)
+    completions.failures = 1
+
+    async def run():
+        failed = await asyncio.gather(
+            *[service._create_completion(messages("flaky"), 0.0, 10) for _ in range(3)],
+            return_exceptions=True
+        )
+        retried = await service._create_completion(messages("flaky"), 0.0, 10)
+        cached = await service._create_completion(messages("flaky"), 0.0, 10)
+        return failed, retried, cached
+
+    failed, retried, cached = asyncio.run(run())
+    assert [type(error) for error in failed] == [RuntimeError] * 3
+    assert retried == cached == "flaky"
+    # One failed call, one retry, then a cache hit
+    assert completions.calls == 2
+
+
+def test_no_cache_requests_are_not_coalesced(completions):
+    service = make_service(completions)
+
+    async def run():
+        return await asyncio.gather(
+            *[service._create_completion(messages("fresh"), 0.0, 10, no_cache=True) for _ in range(3)]
+        )
+
+    assert asyncio.run(run()) == ["fresh"] * 3
+    assert completions.calls == 3
+    assert not ai_service._completion_cache._data
+
+
+def test_concurrency_is_capped(completions, monkeypatch):
+    monkeypatch.setattr(ai_service, "_llm_slots", asyncio.Semaphore(2))
+    service = make_service(completions)
+    active = peak = 0
+    create = completions.create
+
+    async def tracked(**kwargs):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        try:
+            return await create(**kwargs)
+        finally:
+            active -= 1
+
+    completions.create = tracked
+
+    async def run():
+        return await asyncio.gather(*[service._create_completion(messages(f"q{i}"), 0.7, 10) for i in range(6)])
+
+    assert asyncio.run(run()) == [f"q{i}" for i in range(6)]
+    assert peak == 2
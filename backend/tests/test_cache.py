@@ -0,0 +1,191 @@
+"""Tests for the in-process and Redis caching helpers"""
+
+import asyncio
+import time
+
+from app.core import cache
+from app.core.cache import LRUCache, SemanticCache, async_ttl_cache, invalidate_cache, redis_cache
+from app.core.config import settings
+
+
+class Fetcher:
+    """Counts calls to a cached async method"""
+
+    def __init__(self, value=("row",), delay=0.0):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+
+    async def _fetch(self, *args):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.value
+
+
+def make_cached(ttl_seconds=60.0):
+    """A fresh class whose ``fetch`` goes through async_ttl_cache"""
+    class Service(Fetcher):
+        @async_ttl_cache(ttl_seconds=ttl_seconds)
+        async def fetch(self, *args):
+            return await self._fetch(*args)
+    return Service
+
+
+def test_ttl_cache_reuses_value_until_expiry():
+    Service = make_cached(ttl_seconds=0.05)
+    service = Service()
+
+    async def run():
+        first = await service.fetch()
+        second = await service.fetch()
+        await asyncio.sleep(0.06)
+        third = await service.fetch()
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert first == second == third == ("row",)
+    assert service.calls == 2
+
+
+def test_ttl_cache_is_shared_between_instances_and_keyed_on_arguments():
+    Service = make_cached()
+    a, b = Service(), Service()
+
+    async def run():
+        await a.fetch(1)
+        await b.fetch(1)
+        await b.fetch(2)
+
+    asyncio.run(run())
+    assert (a.calls, b.calls) == (1, 1)
+
+
+def test_concurrent_misses_make_a_single_call():
+    Service = make_cached()
+    service = Service(delay=0.02)
+
+    async def run():
+        return await asyncio.gather(*[service.fetch() for _ in range(20)])
+
+    results = asyncio.run(run())
+    assert service.calls == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_empty_results_are_not_cached():
+    Service = make_cached()
+    service = Service(value=[])
+
+    async def run():
+        await service.fetch()
+        await service.fetch()
+
+    asyncio.run(run())
+    assert service.calls == 2
+
+
+def test_invalidate_cache_drops_entries_and_bumps_data_version():
+    Service = make_cached()
+    service = Service()
+    version = cache.data_version()
+
+    async def run():
+        await service.fetch()
+        invalidate_cache("Service.fetch")
+        await service.fetch()
+        invalidate_cache("SomethingElse.fetch")
+        await service.fetch()
+        invalidate_cache()
+        await service.fetch()
+
+    asyncio.run(run())
+    assert service.calls == 3
+    assert cache.data_version() == version + 3
+
+
+def test_refresh_recomputes_while_readers_keep_the_old_value():
+    Service = make_cached()
+    service = Service()
+
+    async def run():
+        old = await service.fetch()
+        service.value = ("new",)
+        refreshing = asyncio.ensure_future(Service.fetch.refresh(service))
+        during = await service.fetch()
+        await refreshing
+        after = await service.fetch()
+        return old, during, after
+
+    old, during, after = asyncio.run(run())
+    assert old == during == ("row",)
+    assert after == ("new",)
+    assert service.calls == 2
+
+
+def test_lru_cache_evicts_least_recently_used():
+    lru = LRUCache(maxsize=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert (lru.get("a"), lru.get("c")) == (1, 3)
+    lru.clear()
+    assert lru.get("a") is None
+
+
+def test_semantic_cache_matches_similar_vectors_for_the_current_data_only():
+    semantic = SemanticCache(threshold=0.9, ttl_seconds=60)
+    semantic.add([1.0, 0.0, 0.0], "answer")
+
+    assert semantic.get([0.99, 0.05, 0.0]) == "answer"
+    assert semantic.get([0.0, 1.0, 0.0]) is None
+    assert semantic.get([1.0, 0.0, 0.0], accept=lambda value: value != "answer") is None
+
+    invalidate_cache()
+    assert semantic.get([1.0, 0.0, 0.0]) is None
+
+
+def test_semantic_cache_evicts_oldest_entry_when_full():
+    semantic = SemanticCache(threshold=0.99, max_entries=2)
+    semantic.add([1.0, 0.0], "x")
+    semantic.add([0.0, 1.0], "y")
+    semantic.add([1.0, 1.0], "z")
+    assert semantic.get([1.0, 0.0]) is None
+    assert semantic.get([0.0, 1.0]) == "y"
+
+
+def test_redis_backs_off_after_a_failure(monkeypatch):
+    # Nothing listens on port 1, so every Redis call fails fast
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://127.0.0.1:1/0")
+    monkeypatch.setattr(cache, "_redis_client", None)
+    monkeypatch.setattr(cache, "_redis_retry_at", 0.0)
+
+    class Service(Fetcher):
+        @redis_cache("test:redis-backoff", ttl_seconds=60)
+        async def fetch(self):
+            return await self._fetch()
+
+    service = Service()
+
+    async def run():
+        first = await service.fetch()
+        assert cache._get_redis() is None
+        second = await service.fetch()
+        return first, second
+
+    start = time.monotonic()
+    first, second = asyncio.run(run())
+    assert first == second == ("row",)
+    assert service.calls == 2
+    assert cache._redis_retry_at > start
+    assert cache._redis_retry_at - time.monotonic() <= cache.REDIS_RETRY_SECONDS
+
+
+def test_redis_helpers_are_no_ops_without_redis():
+    async def run():
+        await cache.redis_set("test:key", {"a": 1}, 60)
+        await cache.invalidate_redis_cache()
+        return await cache.redis_get("test:key")
+
+    assert asyncio.run(run()) is None
@@ -0,0 +1,307 @@
+"""Round-trip tests for the bulk upsert used by DataSyncService"""
+
+import asyncio
+import csv
+import io
+import os
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import Base, SessionLocal, engine
+from app.db.models import Fixture, Player, PlayerGameweekStats, Team
+from app.services import data_sync_service
+from app.services.data_sync_service import DataSyncService
+
+
+def team_data(team_id, code, strength=3):
+    return {"id": team_id, "name": f"Team {code}", "short_name": f"T{code}", "code": code, "strength": strength}
+
+
+def player_data(player_id, element_type=3, team=1, form="1.5", news=""):
+    return {
+        "id": player_id, "web_name": f"P{player_id}", "first_name": "First", "second_name": "Last",
+        "element_type": element_type, "team": team, "now_cost": 50 + player_id, "form": form,
+        "points_per_game": "2.0", "selected_by_percent": "3.1", "expected_goals": "0.5", "news": news,
+    }
+
+
+def fixture_data(fixture_id, team_h=1, team_a=2, kickoff="2025-08-15T19:00:00Z", finished=False):
+    return {
+        "id": fixture_id, "code": 900 + fixture_id, "event": 1, "team_h": team_h, "team_a": team_a,
+        "kickoff_time": kickoff, "finished": finished, "team_h_score": 2 if finished else None,
+        "stats": [{"identifier": "goals_scored", "h": [{"value": 1, "element": 1}]}],
+    }
+
+
+def live_data(player_ids, minutes):
+    return {"elements": {str(i): {"stats": {"minutes": minutes, "total_points": i}, "ict_index": "3.2"} for i in player_ids}}
+
+
+class FakeApi:
+    def __init__(self, teams, players, fixtures, live):
+        self.teams, self.players, self.fixtures, self.live = teams, players, fixtures, live
+
+    async def get_teams_data(self):
+        return self.teams
+
+    async def get_players_data(self):
+        return self.players
+
+    async def get_fixtures(self):
+        return self.fixtures
+
+    async def get_gameweek_live_data(self, gameweek):
+        return self.live
+
+
+async def sync(service, api, *gameweeks):
+    results = [
+        await service.sync_teams(api),
+        await service.sync_players(api),
+        await service.sync_fixtures(api),
+    ]
+    for gameweek in gameweeks:
+        results.append(await service.sync_gameweek_stats(api, gameweek))
+    return results
+
+
+def first_round(player_count):
+    return FakeApi(
+        [team_data(1, 101), team_data(2, 102), team_data(3, 103)],
+        [player_data(i) for i in range(1, player_count + 1)],
+        [fixture_data(i) for i in range(1, player_count + 1)],
+        live_data(range(1, player_count + 1), minutes=90),
+    )
+
+
+def second_round(player_count):
+    """Changes every mutable field and tries to change the immutable ones"""
+    return FakeApi(
+        # Team 101 resent under another id: the stored id must win
+        [team_data(42, 101, strength=5), team_data(2, 102), team_data(3, 103)],
+        # Player 1 changes position; element_type is never updated by a sync
+        [player_data(1, element_type=4, team=2, form="9.9", news="Knock")]
+        + [player_data(i, team=2) for i in range(2, player_count + 3)],
+        # Fixture 1 loses its kickoff time and changes teams; both are kept
+        [fixture_data(1, team_h=3, team_a=1, kickoff=None, finished=True)]
+        + [fixture_data(i, kickoff="2025-09-01T12:00:00Z", finished=True) for i in range(2, player_count + 1)],
+        live_data(range(2, player_count + 3), minutes=45),
+    )
+
+
+def check_round_trip(player_count, session_factory=SessionLocal):
+    service = DataSyncService()
+    assert asyncio.run(sync(service, first_round(player_count), 1)) == [True] * 4
+    assert asyncio.run(sync(service, second_round(player_count), 1, 2)) == [True] * 5
+
+    db = session_factory()
+    try:
+        teams = {team.code: team for team in db.query(Team)}
+        assert teams[101].id == 1
+        assert teams[101].strength == 5
+        assert db.query(Team).count() == 3
+
+        players = {player.id: player for player in db.query(Player)}
+        assert len(players) == player_count + 2
+        assert players[1].element_type == 3
+        assert (players[1].form, players[1].team_id, players[1].news) == (9.9, 2, "Knock")
+        assert players[1].updated_at is not None
+        assert players[player_count + 2].element_type == 3
+
+        fixtures = {fixture.id: fixture for fixture in db.query(Fixture)}
+        assert (fixtures[1].team_h_id, fixtures[1].team_a_id) == (1, 2)
+        assert fixtures[1].finished and fixtures[1].team_h_score == 2
+        assert fixtures[1].kickoff_time.replace(tzinfo=None) == datetime(2025, 8, 15, 19, 0)
+        assert fixtures[2].kickoff_time.replace(tzinfo=None) == datetime(2025, 9, 1, 12, 0)
+        assert fixtures[2].stats == [{"identifier": "goals_scored", "h": [{"value": 1, "element": 1}]}]
+
+        stats = {(row.player_id, row.gameweek): row for row in db.query(PlayerGameweekStats)}
+        # Gameweek 1: players 1..N from the first round, 2..N+2 rewritten or added by the second
+        assert len([key for key in stats if key[1] == 1]) == player_count + 2
+        assert len([key for key in stats if key[1] == 2]) == player_count + 1
+        assert stats[(1, 1)].minutes == 90
+        assert stats[(2, 1)].minutes == 45
+        assert stats[(2, 1)].ict_index == 3.2
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def fresh_tables():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.mark.usefixtures("fresh_tables")
+def test_sync_round_trip_with_sqlite_upsert():
+    check_round_trip(player_count=5)
+
+
+@pytest.mark.usefixtures("fresh_tables")
+def test_sync_round_trip_through_orm_fallback(monkeypatch):
+    monkeypatch.delitem(data_sync_service._UPSERT_INSERTS, "sqlite")
+    upsert_each = DataSyncService._upsert_each
+    calls = []
+
+    def counting_upsert_each(self, db, model, *args):
+        calls.append(model)
+        return upsert_each(self, db, model, *args)
+
+    monkeypatch.setattr(DataSyncService, "_upsert_each", counting_upsert_each)
+    check_round_trip(player_count=5)
+    assert calls.count(Player) == 2 and calls.count(PlayerGameweekStats) == 3
+
+
+@pytest.mark.usefixtures("fresh_tables")
+def test_bulk_upsert_with_no_rows_is_a_no_op():
+    db = SessionLocal()
+    try:
+        DataSyncService()._bulk_upsert(db, Player, [], ("id",))
+        assert db.query(Player).count() == 0
+    finally:
+        db.close()
+
+
+# Strings that CSV and COPY treat specially
+AWKWARD_STRINGS = ["", "\\N", "NULL", 'Knock, "doubtful"', "line one\nline two", "comma,separated", "tab\there", "ünïcode ✓"]
+
+
+def test_copy_field_quotes_every_string_and_leaves_null_bare():
+    assert data_sync_service._copy_field(None) == ""
+    assert data_sync_service._copy_field("") == '""'
+    assert data_sync_service._copy_field("\\N") == '"\\N"'
+    assert data_sync_service._copy_field('say "hi"') == '"say ""hi"""'
+    assert data_sync_service._copy_field("a,b\nc") == '"a,b\nc"'
+    assert data_sync_service._copy_field(7) == "7"
+    assert data_sync_service._copy_field(2.5) == "2.5"
+    assert data_sync_service._copy_field(True) == "True"
+    assert data_sync_service._copy_field([{"a": 'x"y'}]) == '"[{""a"": ""x\\""y""}]"'
+    assert data_sync_service._copy_field(datetime(2025, 8, 15, 19, 0)) == '"2025-08-15 19:00:00"'
+
+
+class RecordingSession:
+    """Just enough of a Session for _copy_to_staging: records SQL and the COPY input"""
+
+    def __init__(self):
+        self.statements = []
+        self.copies = []
+
+    def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+
+    def connection(self):
+        return SimpleNamespace(connection=SimpleNamespace(cursor=lambda: RecordingCursor(self)))
+
+
+class RecordingCursor:
+    def __init__(self, session):
+        self.session = session
+
+    def copy_expert(self, sql, buffer):
+        self.session.copies.append((sql, buffer.read()))
+
+    def close(self):
+        pass
+
+
+def test_copy_to_staging_round_trips_awkward_player_rows():
+    service = DataSyncService()
+    rows = [
+        service._player_row(player_data(i, news=news) | {"first_name": news, "chance_of_playing_next_round": None})
+        for i, news in enumerate(AWKWARD_STRINGS, 1)
+    ]
+    db = RecordingSession()
+
+    staging, columns = service._copy_to_staging(db, Player.__table__, rows)
+
+    assert columns == [*rows[0], "season"]
+    [(sql, data)] = db.copies
+    assert sql == f"COPY {staging} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    parsed = list(csv.reader(io.StringIO(data)))
+    assert len(parsed) == len(rows)
+    for row, fields in zip(rows, parsed):
+        record = dict(zip(columns, fields))
+        assert record["news"] == row["news"]
+        assert record["first_name"] == row["first_name"]
+        assert record["id"] == str(row["id"])
+        assert record["season"] == "2025-26"
+    # NULL is the only bare empty field; empty strings are quoted
+    assert ',"",' in data
+    assert ",," in data
+
+
+def test_copy_staging_tables_get_unique_names():
+    service = DataSyncService()
+    rows = [service._player_row(player_data(1))]
+    db = RecordingSession()
+
+    first, _ = service._copy_to_staging(db, Player.__table__, rows)
+    second, _ = service._copy_to_staging(db, Player.__table__, rows)
+
+    assert first != second
+    assert first.startswith("staging_players_")
+    assert all("CREATE TEMP TABLE" in statement and "ON COMMIT DROP" in statement for statement in db.statements)
+
+
+@pytest.fixture
+def postgres_sessions(monkeypatch):
+    """Sessions on the PostgreSQL database named by TEST_POSTGRES_URL, with the sync pointed at it"""
+    url = os.environ.get("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    pytest.importorskip("psycopg2")
+
+    pg_engine = create_engine(url)
+    Base.metadata.drop_all(bind=pg_engine)
+    Base.metadata.create_all(bind=pg_engine)
+    sessions = sessionmaker(autocommit=False, autoflush=False, bind=pg_engine)
+    monkeypatch.setattr(data_sync_service, "SessionLocal", sessions)
+    yield sessions
+    Base.metadata.drop_all(bind=pg_engine)
+    pg_engine.dispose()
+
+
+def test_postgres_copy_upsert_round_trip(postgres_sessions, monkeypatch):
+    copy_to_staging = DataSyncService._copy_to_staging
+    copied = []
+
+    def counting_copy_to_staging(self, db, table, rows):
+        copied.append(table.name)
+        return copy_to_staging(self, db, table, rows)
+
+    monkeypatch.setattr(DataSyncService, "_copy_to_staging", counting_copy_to_staging)
+
+    # Above the COPY threshold, so players, fixtures and stats are all staged
+    check_round_trip(player_count=data_sync_service._COPY_MIN_ROWS + 20, session_factory=postgres_sessions)
+    assert set(copied) == {"players", "fixtures", "player_gameweek_stats"}
+
+
+def test_postgres_copy_keeps_awkward_strings_and_nulls(postgres_sessions):
+    service = DataSyncService()
+    players = [
+        player_data(i, news=AWKWARD_STRINGS[i % len(AWKWARD_STRINGS)])
+        | {"chance_of_playing_next_round": None if i % 2 else 75}
+        for i in range(1, data_sync_service._COPY_MIN_ROWS + 21)
+    ]
+    api = FakeApi([team_data(1, 101)], players, [], {})
+    assert asyncio.run(service.sync_teams(api)) and asyncio.run(service.sync_players(api))
+    # A second staged upsert into the same table in one transaction
+    db = postgres_sessions()
+    try:
+        rows = [service._player_row(player) for player in players]
+        service._bulk_upsert(db, Player, rows, ("id",), immutable=("element_type",))
+        service._bulk_upsert(db, Player, rows, ("id",), immutable=("element_type",))
+        db.commit()
+
+        stored = {player.id: player for player in db.query(Player)}
+        for player in players:
+            assert stored[player["id"]].news == player["news"]
+            assert stored[player["id"]].chance_of_playing_next_round == player["chance_of_playing_next_round"]
+    finally:
+        db.close()
@@ -0,0 +1,111 @@
+"""Tests that PlayerTable ranks and buckets players exactly like sorting the dicts"""
+
+import random
+
+import numpy as np
+import pytest
+
+from app.services import player_table
+from app.services.player_table import POSITIONS, PlayerTable, get_player_table
+
+
+def make_players(seed, count=200):
+    """Players with heavily repeated stats, so ranking ties are common"""
+    rng = random.Random(seed)
+    return [
+        {
+            "id": i,
+            "name": f"Player {i}",
+            "team": f"Team {rng.randint(1, 6)}",
+            "position": rng.choice(POSITIONS + ("Unknown", None)),
+            "price": rng.choice([4.0, 4.5, 5.0, 7.5, 10.0]),
+            "total_points": rng.choice([0, 10, 20, 40, 80]),
+            "form": rng.choice([0.0, 1.5, 3.0, None]),
+            "goals_scored": rng.randint(0, 3),
+            "assists": rng.randint(0, 3),
+            "points_per_game": rng.choice([1.0, 2.5, 4.0]),
+            "selected_by_percent": rng.choice([1.0, 5.0, 20.0]),
+        }
+        for i in range(count)
+    ]
+
+
+def baseline_top(players, score, keep, limit):
+    """Selection as the dict-based code did it: stable sort by score, best first"""
+    candidates = [i for i, player in enumerate(players) if keep(player)]
+    return sorted(candidates, key=lambda i: score(players[i]), reverse=True)[:limit]
+
+
+def captain_score(player):
+    return (
+        player["goals_scored"] * 6
+        + player["assists"] * 3
+        + (player["form"] or 0) * 2
+        + player["total_points"] * 0.1
+    )
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("limit", [0, 1, 5, 15, 1000])
+def test_top_indices_matches_stable_sort_including_ties(seed, limit):
+    players = make_players(seed)
+    table = PlayerTable(players)
+
+    for position in POSITIONS:
+        expected = baseline_top(players, captain_score, lambda p: p["position"] == position, limit)
+        got = table.top_indices(table.captain_score, table.position_mask(position), limit)
+        assert got.tolist() == expected
+
+    points = lambda p: p["total_points"]
+    expected = baseline_top(players, points, lambda p: True, limit)
+    got = table.top_indices(table.total_points, np.ones(len(table), dtype=bool), limit)
+    assert got.tolist() == expected
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_top_overall_matches_sorted_players(seed):
+    players = make_players(seed)
+    score = lambda p: p["total_points"] + (p["form"] or 0) * 2
+    expected = [players[i] for i in baseline_top(players, score, lambda p: True, 20)]
+    assert PlayerTable(players).top_overall == expected
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_by_position_keeps_list_order(seed):
+    players = make_players(seed)
+    buckets = PlayerTable(players).by_position
+
+    for position in POSITIONS:
+        assert buckets[position] == [p for p in players if p["position"] == position]
+    assert sum(len(bucket) for bucket in buckets.values()) == len(players)
+
+
+def test_position_mask_maps_unknown_positions_to_one_shared_mask():
+    players = make_players(0)
+    table = PlayerTable(players)
+
+    assert table.position_mask("MID").tolist() == [p["position"] == "MID" for p in players]
+    unknown = [p["position"] not in POSITIONS for p in players]
+    assert table.position_mask("Unknown").tolist() == unknown
+    assert table.position_mask(None) is table.position_mask("Unknown")
+    assert table.position_mask("GK") is table.position_mask("GK")
+
+
+def test_empty_table():
+    table = PlayerTable([])
+    assert table.top_indices(table.captain_score, table.position_mask("GK"), 5).tolist() == []
+    assert table.top_overall == []
+    assert table.by_position == {position: [] for position in POSITIONS}
+
+
+def test_get_player_table_reuses_the_table_for_the_same_list(monkeypatch):
+    monkeypatch.setattr(player_table, "_last_table", {"players": None, "table": None})
+    players = make_players(1)
+
+    table = get_player_table(players)
+    assert get_player_table(players) is table
+
+    equal_copy = list(players)
+    rebuilt = get_player_table(equal_copy)
+    assert rebuilt is not table
+    assert rebuilt.players is equal_copy